@@ -1,10 +1,14 @@
 from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from app.utils.db_engine import RoutingSession, configure_database, init_replica_routing
+from app.utils.metrics import add_server_timing
+from app.utils.sql_profiler import init_sql_profiler
+from app.utils.compression import init_compression
 import os
 import secrets
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 
 # Load from environment variables
@@ -19,15 +23,30 @@ def create_app():
     database_url = os.environ.get('DATABASE_URL', 'sqlite:///invoices.db')
     if database_url.startswith('postgres://'):
         database_url = database_url.replace('postgres://', 'postgresql://', 1)
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    configure_database(app, database_url)
+    app.config['REPLICA_STICKY_SECONDS'] = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SQLALCHEMY_ECHO'] = False
+    app.config['SQL_PROFILING'] = os.environ.get('SQL_PROFILING', '').lower() in ('1', 'true', 'yes')
+    app.config['SQL_SLOW_QUERY_MS'] = int(os.environ.get('SQL_SLOW_QUERY_MS', 100))
+    app.config['SQL_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
     app.config['UPLOAD_FOLDER'] = 'app/static/uploads'
+    app.config['ARCHIVE_FOLDER'] = os.environ.get('ARCHIVE_FOLDER', 'archive')
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
     app.config['MAX_CONTENT_LENGTH'] = 16777216
+    app.config['ZIP_MAX_CONTENT_LENGTH'] = int(os.environ.get('ZIP_MAX_CONTENT_LENGTH', 536870912))
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['PDF_TOKEN_BUDGET'] = int(os.environ.get('PDF_TOKEN_BUDGET', 6000))
+    app.config['DUPLICATE_HASH_THRESHOLD'] = int(os.environ.get('DUPLICATE_HASH_THRESHOLD', 24))
     app.config['SESSION_COOKIE_SECURE'] = False
     app.config['SESSION_COOKIE_HTTPONLY'] = True
     app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
     app.config['PERMANENT_SESSION_LIFETIME'] = 3600
+    app.config['TYPEAHEAD_MAX_ENTRIES'] = int(os.environ.get('TYPEAHEAD_MAX_ENTRIES', 200000))
+    app.config['TYPEAHEAD_TTL'] = int(os.environ.get('TYPEAHEAD_TTL', 300))
+    app.config['EXTRACTION_INTERACTIVE_WEIGHT'] = int(os.environ.get('EXTRACTION_INTERACTIVE_WEIGHT', 3))
+    app.config['EXTRACTION_MAX_WAIT'] = int(os.environ.get('EXTRACTION_MAX_WAIT', 300))
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
     
     db.init_app(app)
     login_manager.init_app(app)
@@ -50,9 +69,23 @@ def create_app():
         response.headers['Permissions-Policy'] = 'geolocation=(), microphone=(), camera=()'
         return response
     
+    app.after_request(add_server_timing)
+    init_replica_routing(app, db)
+    init_sql_profiler(app)
+    init_compression(app)
+    
     # Import models
     from app.models.user import User
     from app.models.invoice import Invoice
+    from app.models.fingerprint import InvoiceFingerprint, InvoiceFingerprintBucket
+    from app.models.archived_invoice import ArchivedInvoice
+    
+    # Keep typeahead indexes in step with invoice changes
+    from app.utils.typeahead import init_typeahead
+    init_typeahead(app, db, Invoice)
+    
+    from app.utils.scheduler import extraction_scheduler
+    extraction_scheduler.configure(app.config['EXTRACTION_INTERACTIVE_WEIGHT'], app.config['EXTRACTION_MAX_WAIT'])
     
     # User loader for Flask-Login
     @login_manager.user_loader
@@ -63,10 +96,16 @@ def create_app():
     from app.routes.auth import auth_bp
     from app.routes.main import main_bp
     from app.routes.invoice import invoice_bp
+    from app.routes.metrics import metrics_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(invoice_bp)
+    app.register_blueprint(metrics_bp)
+    
+    # Register CLI commands
+    from app.cli import invoices_cli
+    app.cli.add_command(invoices_cli)
     
     with app.app_context():
         try:
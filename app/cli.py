@@ -0,0 +1,173 @@
+from flask import current_app
+from flask.cli import AppGroup
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from werkzeug.utils import secure_filename
+from app import db, ADMIN_EMAIL
+from app.models.user import User
+from app.models.invoice import Invoice
+from app.routes.invoice import allowed_file, generate_secure_filename, find_duplicates, add_fingerprint
+from app.utils.gemini_extractor import extract_invoice_data, RateLimitExceeded
+from app.utils.image_hash import compute_phash
+from app.utils.metrics import CACHE_HITS
+from app.utils.archiver import archive_invoices
+from app.utils.scheduler import extraction_scheduler, BATCH
+import click
+import os
+import shutil
+import time
+
+invoices_cli = AppGroup('invoices', help='Invoice maintenance commands')
+
+RATE_LIMIT_BACKOFF = 5
+
+@invoices_cli.command('ingest')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--user', 'email', default=ADMIN_EMAIL, show_default=True, help='Owner of the imported invoices')
+@click.option('--api-key', envvar='GEMINI_API_KEY', required=True, help='Gemini API key (or GEMINI_API_KEY)')
+@click.option('--workers', default=4, show_default=True, type=click.IntRange(1, 32), help='Concurrent extractions')
+@click.option('--batch-size', default=20, show_default=True, type=click.IntRange(1), help='Invoices per commit')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='Progress file (default: DIRECTORY/.ingest-checkpoint)')
+@click.option('--link-duplicates', is_flag=True, help='Skip files whose image matches an existing invoice instead of extracting them')
+def ingest(directory, email, api_key, workers, batch_size, checkpoint, link_duplicates):
+    """Import every invoice file under DIRECTORY, resuming from the checkpoint"""
+    user = User.query.filter_by(email=email.strip().lower()).first()
+    if not user:
+        raise click.ClickException(f'No user with email {email}')
+
+    checkpoint = checkpoint or os.path.join(directory, '.ingest-checkpoint')
+    done = _load_checkpoint(checkpoint)
+    pending = [path for path in _walk_invoices(directory) if path not in done]
+    click.echo(f'{len(pending)} files to ingest, {len(done)} already done')
+
+    upload_folder = os.path.join(os.getcwd(), 'app', 'static', 'uploads')
+    os.makedirs(upload_folder, exist_ok=True)
+
+    app = current_app._get_current_object()
+    counts = {'processed': 0, 'failed': 0, 'duplicates': 0}
+    finished = []
+    started = time.time()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(checkpoint, 'a') as progress:
+        in_flight = {}
+        queue = iter(pending)
+
+        while True:
+            # Keep at most two files per worker queued
+            for relative_path in queue:
+                future = executor.submit(_extract_file, app, directory, relative_path, upload_folder,
+                                         user.id, api_key, link_duplicates)
+                in_flight[future] = relative_path
+                if len(in_flight) >= workers * 2:
+                    break
+            if not in_flight:
+                break
+
+            completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                relative_path = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    counts['failed'] += 1
+                    click.echo(f'Failed: {relative_path} ({e})', err=True)
+                    continue
+
+                if 'data' not in result:
+                    counts['duplicates'] += 1
+                    click.echo(f'Skipped: {relative_path} (near-duplicate of invoice #{result["duplicates"][0]})')
+                else:
+                    if _add_invoice(user.id, result):
+                        counts['duplicates'] += 1
+                    counts['processed'] += 1
+                finished.append(relative_path)
+
+            if len(finished) >= batch_size:
+                _commit_batch(finished, progress)
+
+        _commit_batch(finished, progress)
+
+    elapsed = time.time() - started
+    rate = counts['processed'] / elapsed * 60 if elapsed else 0
+    click.echo(f"Ingested {counts['processed']} invoices in {elapsed:.1f}s ({rate:.1f}/min). "
+               f"{counts['failed']} failed, {counts['duplicates']} near-duplicates "
+               f"{'skipped' if link_duplicates else 'marked as duplicates'}.")
+
+@invoices_cli.command('archive')
+@click.option('--older-than-days', type=click.IntRange(1), help='Age cutoff (default: ARCHIVE_AFTER_DAYS)')
+@click.option('--batch-size', default=200, show_default=True, type=click.IntRange(1), help='Invoices per commit')
+def archive(older_than_days, batch_size):
+    """Move old invoices to the archive table and pack their files per month"""
+    older_than_days = older_than_days or current_app.config['ARCHIVE_AFTER_DAYS']
+    upload_folder = os.path.join(os.getcwd(), 'app', 'static', 'uploads')
+    archive_folder = os.path.abspath(current_app.config['ARCHIVE_FOLDER'])
+
+    started = time.time()
+    count = archive_invoices(older_than_days, upload_folder, archive_folder, batch_size)
+    click.echo(f'Archived {count} invoices older than {older_than_days} days in {time.time() - started:.1f}s')
+
+def _walk_invoices(directory):
+    """Relative paths of allowed invoice files, in a stable order"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if allowed_file(name):
+                paths.append(os.path.relpath(os.path.join(root, name), directory))
+    return paths
+
+def _load_checkpoint(checkpoint):
+    """Relative paths already committed by an earlier run"""
+    if not os.path.exists(checkpoint):
+        return set()
+    with open(checkpoint) as progress:
+        return {line.rstrip('\n') for line in progress if line.strip()}
+
+def _extract_file(app, directory, relative_path, upload_folder, user_id, api_key, link_duplicates):
+    """Copy, fingerprint and extract one file; runs in a worker thread"""
+    original_filename = secure_filename(relative_path)
+    secure_name = generate_secure_filename(original_filename)
+    file_path = os.path.join(upload_folder, secure_name)
+    shutil.copyfile(os.path.join(directory, relative_path), file_path)
+
+    try:
+        phash = compute_phash(file_path)
+        with app.app_context():
+            duplicates = find_duplicates(phash, user_id)
+
+        if duplicates and link_duplicates:
+            os.remove(file_path)
+            CACHE_HITS.labels(cache='duplicate').inc()
+            return {'duplicates': duplicates}
+
+        while True:
+            try:
+                extracted_data = extraction_scheduler.run(user_id, BATCH, extract_invoice_data, file_path, api_key, app.config['PDF_TOKEN_BUDGET'])
+                break
+            except RateLimitExceeded:
+                time.sleep(RATE_LIMIT_BACKOFF)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    return {
+        'filename': original_filename,
+        'file_path': secure_name,
+        'phash': phash,
+        'duplicates': duplicates,
+        'data': extracted_data,
+    }
+
+def _add_invoice(user_id, result):
+    """Stage an extracted invoice and its fingerprint; returns the original if it is a confirmed duplicate"""
+    invoice = Invoice.from_extracted(user_id, result['filename'], result['file_path'], result['data'])
+    db.session.add(invoice)
+    return add_fingerprint(invoice, result['phash'], result['duplicates'])
+
+def _commit_batch(finished, progress):
+    """Commit staged invoices, then record their files in the checkpoint"""
+    db.session.commit()
+    for relative_path in finished:
+        progress.write(f'{relative_path}\n')
+    progress.flush()
+    finished.clear()
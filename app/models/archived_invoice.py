@@ -0,0 +1,52 @@
+from app import db
+from app.models.invoice import Invoice
+from datetime import datetime
+
+class ArchivedInvoice(db.Model):
+    """Invoice moved out of the hot table; keeps its original id"""
+    __tablename__ = 'archived_invoices'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+
+    # File information, file_path is the member name inside archive_file
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    archive_file = db.Column(db.String(255))
+
+    # Extracted invoice data
+    invoice_number = db.Column(db.String(100))
+    invoice_date = db.Column(db.String(50))
+    vendor_name = db.Column(db.String(200))
+    vendor_address = db.Column(db.Text)
+    customer_name = db.Column(db.String(200))
+    customer_address = db.Column(db.Text)
+
+    # Financial data
+    subtotal = db.Column(db.String(50))
+    tax_amount = db.Column(db.String(50))
+    total_amount = db.Column(db.String(50))
+
+    items = db.Column(db.Text)
+    category = db.Column(db.String(100), default='Uncategorized')
+    status = db.Column(db.String(50), default='Processed')
+
+    # Metadata
+    created_at = db.Column(db.DateTime, index=True)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user = db.relationship('User')
+
+    get_items = Invoice.get_items
+
+    @classmethod
+    def from_invoice(cls, invoice, archive_file):
+        """Copy every column of a hot invoice into an archive row"""
+        archived = cls(archive_file=archive_file)
+        for column in Invoice.__table__.columns:
+            setattr(archived, column.key, getattr(invoice, column.key))
+        return archived
+
+    def __repr__(self):
+        return f'<ArchivedInvoice {self.invoice_number}>'
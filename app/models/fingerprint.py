@@ -0,0 +1,71 @@
+from app import db
+from app.utils.image_hash import hamming_distance, informative_buckets, HASH_SIZE
+from datetime import datetime
+
+# Most fingerprints compared exactly per lookup
+CANDIDATE_LIMIT = 50
+
+class InvoiceFingerprint(db.Model):
+    """Perceptual hash of an uploaded invoice, indexed for near-duplicate lookup"""
+    __tablename__ = 'invoice_fingerprints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+
+    # 256-bit hash as hex; its buckets live in invoice_fingerprint_buckets
+    phash = db.Column(db.String(HASH_SIZE * HASH_SIZE // 4), nullable=False)
+
+    # Id of the invoice this one was confirmed to duplicate (it may since have been archived)
+    duplicate_of_id = db.Column(db.Integer, index=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    buckets = db.relationship('InvoiceFingerprintBucket', backref='fingerprint', cascade='all, delete-orphan')
+
+    @classmethod
+    def create(cls, invoice, phash):
+        """Build a fingerprint row and its buckets for an invoice"""
+        fingerprint = cls(invoice=invoice, user_id=invoice.user_id, phash=f'{phash:064x}')
+        fingerprint.buckets = [
+            InvoiceFingerprintBucket(user_id=invoice.user_id, position=i, value=value)
+            for i, value in informative_buckets(phash)
+        ]
+        return fingerprint
+
+    @classmethod
+    def find_near_duplicates(cls, user_id, phash, threshold):
+        """
+        Return fingerprints within threshold bits, closest first
+        Only the CANDIDATE_LIMIT fingerprints sharing the most informative buckets are compared,
+        so a match is likely rather than guaranteed; a hash with none falls back to the most recent
+        """
+        buckets = informative_buckets(phash)
+        if buckets:
+            bucket = InvoiceFingerprintBucket
+            shared = db.func.count(bucket.id)
+            matches = db.session.query(bucket.fingerprint_id).filter(
+                bucket.user_id == user_id,
+                db.or_(*[db.and_(bucket.position == i, bucket.value == value) for i, value in buckets])
+            ).group_by(bucket.fingerprint_id).order_by(shared.desc()).limit(CANDIDATE_LIMIT)
+            candidates = cls.query.filter(cls.id.in_(matches.scalar_subquery())).all()
+        else:
+            candidates = cls.query.filter_by(user_id=user_id).order_by(cls.id.desc()).limit(CANDIDATE_LIMIT).all()
+
+        distances = [(hamming_distance(phash, int(candidate.phash, 16)), candidate) for candidate in candidates]
+        return [candidate for distance, candidate in sorted(distances, key=lambda pair: pair[0])
+                if distance <= threshold]
+
+    def __repr__(self):
+        return f'<InvoiceFingerprint {self.phash}>'
+
+class InvoiceFingerprintBucket(db.Model):
+    """One informative slice of a fingerprint hash; exact bucket matches rank lookup candidates"""
+    __tablename__ = 'invoice_fingerprint_buckets'
+    __table_args__ = (db.Index('ix_fingerprint_bucket_lookup', 'user_id', 'position', 'value'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    fingerprint_id = db.Column(db.Integer, db.ForeignKey('invoice_fingerprints.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.SmallInteger, nullable=False)
+    value = db.Column(db.Integer, nullable=False)
@@ -5,6 +5,8 @@ import json
 class Invoice(db.Model):
     """Invoice model to store extracted invoice data"""
     __tablename__ = 'invoices'
+    # Deleted ids are never handed out again, so archived invoices keep a unique id
+    __table_args__ = {'sqlite_autoincrement': True}
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -37,6 +39,28 @@ class Invoice(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    fingerprint = db.relationship('InvoiceFingerprint', backref='invoice', uselist=False, cascade='all, delete-orphan')
+    
+    @classmethod
+    def from_extracted(cls, user_id, filename, file_path, extracted_data):
+        """Build an invoice from extract_invoice_data output"""
+        invoice = cls(
+            user_id=user_id,
+            filename=filename,
+            file_path=file_path,
+            invoice_number=extracted_data.get('invoice_number'),
+            invoice_date=extracted_data.get('invoice_date'),
+            vendor_name=extracted_data.get('vendor_name'),
+            vendor_address=extracted_data.get('vendor_address'),
+            customer_name=extracted_data.get('customer_name'),
+            customer_address=extracted_data.get('customer_address'),
+            subtotal=extracted_data.get('subtotal'),
+            tax_amount=extracted_data.get('tax_amount'),
+            total_amount=extracted_data.get('total_amount')
+        )
+        invoice.set_items(extracted_data.get('items', []))
+        return invoice
+    
     def set_items(self, items_list):
         """Convert items list to JSON string"""
         self.items = json.dumps(items_list)
@@ -1,17 +1,37 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, session
+from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, session, current_app, jsonify, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from app import db
 from app.models.invoice import Invoice
+from app.models.fingerprint import InvoiceFingerprint
+from app.models.archived_invoice import ArchivedInvoice
 from app.utils.gemini_extractor import extract_invoice_data
 from app.utils.excel_exporter import export_to_excel
+from app.utils.db_engine import use_replica
+from app.utils.image_hash import compute_phash, BUCKET_COUNT
+from app.utils.zip_stream import iter_zip_entries, ZipStreamError
+from app.utils.metrics import timed, CACHE_HITS
+from app.utils.typeahead import typeahead_cache, TYPEAHEAD_FIELDS
+from app.utils.archiver import read_archived_file
+from app.utils.scheduler import extraction_scheduler, INTERACTIVE, BATCH
+from io import BytesIO
+import mimetypes
 import os
 import hashlib
-from datetime import datetime
+from collections import Counter
+from datetime import datetime, timezone
 
 invoice_bp = Blueprint('invoice', __name__, url_prefix='/invoice')
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
+ZIP_MIMETYPES = {'application/zip', 'application/x-zip-compressed', 'application/octet-stream'}
+ZIP_COMMIT_BATCH = 20
+EDITABLE_FIELDS = {
+    'invoice_number', 'invoice_date', 'vendor_name', 'vendor_address', 'customer_name',
+    'customer_address', 'subtotal', 'tax_amount', 'total_amount', 'category', 'status'
+}
+BULK_EDIT_MAX = 1000
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
@@ -24,6 +44,49 @@ def generate_secure_filename(filename):
     ext = filename.rsplit('.', 1)[1].lower()
     return f"{hash_object.hexdigest()}.{ext}"
 
+def get_invoice_or_archived(invoice_id):
+    """Look up an invoice in the hot table, then the archive; returns (invoice, archived)"""
+    invoice = Invoice.query.get(invoice_id)
+    if invoice is not None:
+        return invoice, False
+    return ArchivedInvoice.query.get_or_404(invoice_id), True
+
+def find_duplicates(phash, user_id=None):
+    """Ids of a user's invoices (default: current user) whose image is close to an upload, closest first"""
+    if phash is None:
+        return []
+    threshold = min(current_app.config['DUPLICATE_HASH_THRESHOLD'], BUCKET_COUNT - 1)
+    matches = InvoiceFingerprint.find_near_duplicates(user_id or current_user.id, phash, threshold)
+    return [match.invoice_id for match in matches]
+
+def _normalized(value):
+    """Field value for comparison, or None when the model found nothing"""
+    value = ''.join((value or '').split()).lower()
+    return None if value in ('', 'n/a') else value
+
+def add_fingerprint(invoice, phash, candidate_ids):
+    """
+    Store an upload's fingerprint and flag it as a duplicate of the first hash match in candidate_ids
+    whose extracted invoice number and total agree; invoices from one template hash alike
+    Returns the id of the confirmed original, or None
+    """
+    if phash is None:
+        return None
+    fingerprint = InvoiceFingerprint.create(invoice, phash)
+    db.session.add(fingerprint)
+
+    keys = [_normalized(invoice.invoice_number), _normalized(invoice.total_amount)]
+    if not candidate_ids or None in keys:
+        return None
+    originals = {original.id: original for original in Invoice.query.filter(Invoice.id.in_(candidate_ids))}
+    for candidate_id in candidate_ids:
+        original = originals.get(candidate_id)
+        if original is not None and keys == [_normalized(original.invoice_number), _normalized(original.total_amount)]:
+            invoice.status = 'Duplicate'
+            fingerprint.duplicate_of_id = original.id
+            return original.id
+    return None
+
 @invoice_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload():
@@ -48,7 +111,8 @@ def upload():
             upload_folder = os.path.join(os.getcwd(), 'app', 'static', 'uploads')
             os.makedirs(upload_folder, exist_ok=True)
             file_path = os.path.join(upload_folder, secure_name)
-            file.save(file_path)
+            with timed('file_save'):
+                file.save(file_path)
             
             try:
                 # Get API key from session
@@ -59,30 +123,30 @@ def upload():
                         os.remove(file_path)
                     return redirect(url_for('auth.logout'))
                 
+                # Opt-in: trust the image match and show the existing invoice instead of re-extracting
+                with timed('phash'):
+                    phash = compute_phash(file_path)
+                duplicates = find_duplicates(phash)
+                if duplicates and request.form.get('duplicate_action') == 'link':
+                    os.remove(file_path)
+                    CACHE_HITS.labels(cache='duplicate').inc()
+                    flash(f'This file looks like a re-scan of invoice #{duplicates[0]}. Showing the existing invoice.', 'warning')
+                    return redirect(url_for('invoice.view', invoice_id=duplicates[0]))
+                
                 # Extract data using Gemini AI
-                extracted_data = extract_invoice_data(file_path, api_key)
+                extracted_data = extraction_scheduler.run(current_user.id, INTERACTIVE, extract_invoice_data, file_path, api_key, current_app.config['PDF_TOKEN_BUDGET'])
                 
                 # Save to database
-                invoice = Invoice(
-                    user_id=current_user.id,
-                    filename=original_filename,
-                    file_path=secure_name,
-                    invoice_number=extracted_data.get('invoice_number'),
-                    invoice_date=extracted_data.get('invoice_date'),
-                    vendor_name=extracted_data.get('vendor_name'),
-                    vendor_address=extracted_data.get('vendor_address'),
-                    customer_name=extracted_data.get('customer_name'),
-                    customer_address=extracted_data.get('customer_address'),
-                    subtotal=extracted_data.get('subtotal'),
-                    tax_amount=extracted_data.get('tax_amount'),
-                    total_amount=extracted_data.get('total_amount')
-                )
-                invoice.set_items(extracted_data.get('items', []))
-                
+                invoice = Invoice.from_extracted(current_user.id, original_filename, secure_name, extracted_data)
                 db.session.add(invoice)
-                db.session.commit()
+                duplicate_of = add_fingerprint(invoice, phash, duplicates)
+                with timed('db_commit'):
+                    db.session.commit()
                 
-                flash('Invoice processed successfully!', 'success')
+                if duplicate_of:
+                    flash(f'Invoice processed. It matches invoice #{duplicate_of} and was marked as a duplicate.', 'warning')
+                else:
+                    flash('Invoice processed successfully!', 'success')
                 return redirect(url_for('invoice.view', invoice_id=invoice.id))
             
             except Exception as e:
@@ -98,16 +162,38 @@ def upload():
 
 @invoice_bp.route('/view/<int:invoice_id>')
 @login_required
+@use_replica
 def view(invoice_id):
     """View invoice details"""
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice, archived = get_invoice_or_archived(invoice_id)
     
     # Check access permission
     if not current_user.is_admin() and invoice.user_id != current_user.id:
         flash('Access denied', 'danger')
         return redirect(url_for('main.dashboard'))
     
-    return render_template('invoice_view.html', invoice=invoice)
+    if archived:
+        file_url = url_for('invoice.archived_file', invoice_id=invoice.id)
+    else:
+        file_url = url_for('static', filename='uploads/' + invoice.file_path)
+    return render_template('invoice_view.html', invoice=invoice, archived=archived, file_url=file_url)
+
+@invoice_bp.route('/archived-file/<int:invoice_id>')
+@login_required
+@use_replica
+def archived_file(invoice_id):
+    """Serve the original upload of an archived invoice from its month archive"""
+    invoice = ArchivedInvoice.query.get_or_404(invoice_id)
+    
+    if not current_user.is_admin() and invoice.user_id != current_user.id:
+        flash('Access denied', 'danger')
+        return redirect(url_for('main.dashboard'))
+    
+    data = read_archived_file(current_app.config['ARCHIVE_FOLDER'], invoice)
+    if data is None:
+        abort(404)
+    mimetype = mimetypes.guess_type(invoice.file_path)[0] or 'application/octet-stream'
+    return send_file(BytesIO(data), mimetype=mimetype, download_name=invoice.filename)
 
 @invoice_bp.route('/delete/<int:invoice_id>', methods=['POST'])
 @login_required
@@ -144,9 +230,10 @@ def delete(invoice_id):
 
 @invoice_bp.route('/export/<int:invoice_id>')
 @login_required
+@use_replica
 def export(invoice_id):
     """Export single invoice to Excel"""
-    invoice = Invoice.query.get_or_404(invoice_id)
+    invoice, _ = get_invoice_or_archived(invoice_id)
     
     # Check permission
     if not current_user.is_admin() and invoice.user_id != current_user.id:
@@ -158,12 +245,20 @@ def export(invoice_id):
 
 @invoice_bp.route('/export-all')
 @login_required
+@use_replica
 def export_all():
-    """Export all user invoices to Excel"""
-    if current_user.is_admin():
-        invoices = Invoice.query.all()
-    else:
-        invoices = Invoice.query.filter_by(user_id=current_user.id).all()
+    """Export all user invoices to Excel, optionally including archived ones"""
+    models = [Invoice]
+    if request.args.get('include_archived'):
+        models.append(ArchivedInvoice)
+    
+    invoices = []
+    for model in models:
+        # Eager-load owners, the export reads invoice.user per row
+        query = model.query.options(db.joinedload(model.user))
+        if not current_user.is_admin():
+            query = query.filter_by(user_id=current_user.id)
+        invoices.extend(query.all())
     
     if not invoices:
         flash('No invoices to export', 'warning')
@@ -201,6 +296,125 @@ def edit(invoice_id):
     
     return render_template('invoice_edit.html', invoice=invoice)
 
+@invoice_bp.route('/bulk-edit', methods=['POST'])
+@login_required
+def bulk_edit():
+    """
+    Apply a JSON list of {id, fields, updated_at} patches in one transaction
+    updated_at is optional; when given, the patch only applies if the row is unchanged since
+    """
+    patches = request.get_json(silent=True)
+    if isinstance(patches, dict):
+        patches = patches.get('patches')
+    if not isinstance(patches, list) or not patches:
+        return jsonify({'error': 'Expected a non-empty list of patches'}), 400
+    if len(patches) > BULK_EDIT_MAX:
+        return jsonify({'error': f'At most {BULK_EDIT_MAX} patches per request'}), 400
+    
+    # Results follow request order; ids are only counted once they pass validation
+    results = []
+    for patch in patches:
+        invoice_id, error = _validate_patch(patch)
+        results.append({'id': invoice_id, 'status': 'invalid', 'error': error} if error else {'id': invoice_id})
+    id_counts = Counter(result['id'] for result in results if 'status' not in result)
+    positions = {}
+    valid = []
+    for position, (patch, result) in enumerate(zip(patches, results)):
+        if 'status' in result:
+            continue
+        if id_counts[result['id']] > 1:
+            result.update(status='invalid', error='Duplicate id in request')
+            continue
+        positions[patch['id']] = position
+        valid.append(patch)
+    
+    try:
+        # One scoped query for ownership and current versions
+        query = db.session.query(Invoice.id, Invoice.updated_at).filter(Invoice.id.in_(list(positions)))
+        if not current_user.is_admin():
+            query = query.filter(Invoice.user_id == current_user.id)
+        current_versions = dict(query.all())
+        
+        now = datetime.utcnow()
+        groups = {}
+        for patch in valid:
+            invoice_id = patch['id']
+            if invoice_id not in current_versions:
+                results[positions[invoice_id]]['status'] = 'not_found'
+                continue
+            expected = patch['expected'] or current_versions[invoice_id]
+            if expected != current_versions[invoice_id]:
+                results[positions[invoice_id]]['status'] = 'conflict'
+                continue
+            params = {'_id': invoice_id, '_expected': expected, 'new_updated_at': now}
+            params.update({f'new_{field}': value for field, value in patch['fields'].items()})
+            groups.setdefault(frozenset(patch['fields']), []).append(params)
+        
+        table = Invoice.__table__
+        for fields, rows in groups.items():
+            values = {field: db.bindparam(f'new_{field}') for field in fields}
+            values['updated_at'] = db.bindparam('new_updated_at')
+            statement = table.update().where(
+                table.c.id == db.bindparam('_id'),
+                table.c.updated_at == db.bindparam('_expected')
+            ).values(values)
+            db.session.execute(statement, rows)
+        
+        # Rows changed between our read and the UPDATE keep a foreign updated_at
+        attempted = [row['_id'] for rows in groups.values() for row in rows]
+        applied = {
+            invoice_id for invoice_id, in db.session.query(Invoice.id)
+            .filter(Invoice.id.in_(attempted), Invoice.updated_at == now)
+        }
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Bulk edit failed: {str(e)}'}), 500
+    
+    # Core UPDATEs bypass the ORM events that keep typeahead indexes current
+    if any(fields & set(TYPEAHEAD_FIELDS) for fields in groups):
+        typeahead_cache.invalidate(None if current_user.is_admin() else current_user.id)
+    
+    for invoice_id in attempted:
+        if invoice_id in applied:
+            results[positions[invoice_id]].update(status='updated', updated_at=now.isoformat())
+        else:
+            results[positions[invoice_id]]['status'] = 'conflict'
+    
+    return jsonify({'updated': len(applied), 'results': results})
+
+def _validate_patch(patch):
+    """Normalize a bulk-edit patch in place; returns (id, error message or None)"""
+    if not isinstance(patch, dict):
+        return None, 'Patch must be an object'
+    
+    invoice_id = patch.get('id')
+    if not isinstance(invoice_id, int) or isinstance(invoice_id, bool):
+        return invoice_id if isinstance(invoice_id, (str, int)) else None, 'id must be an integer'
+    # Larger values overflow the database's 64-bit integer binding
+    if not 0 < invoice_id < 2 ** 63:
+        return invoice_id, 'id is out of range'
+    
+    fields = patch.get('fields')
+    if not isinstance(fields, dict) or not fields:
+        return invoice_id, 'fields must be a non-empty object'
+    unknown = set(fields) - EDITABLE_FIELDS
+    if unknown:
+        return invoice_id, f"Fields not editable: {', '.join(sorted(unknown))}"
+    if any(value is not None and not isinstance(value, str) for value in fields.values()):
+        return invoice_id, 'Field values must be strings or null'
+    
+    patch['expected'] = None
+    if patch.get('updated_at'):
+        try:
+            expected = datetime.fromisoformat(patch['updated_at'])
+        except (TypeError, ValueError):
+            return invoice_id, 'updated_at must be an ISO 8601 timestamp'
+        if expected.tzinfo:
+            expected = expected.astimezone(timezone.utc).replace(tzinfo=None)
+        patch['expected'] = expected
+    return invoice_id, None
+
 @invoice_bp.route('/bulk-upload', methods=['GET', 'POST'])
 @login_required
 def bulk_upload():
@@ -214,6 +428,8 @@ def bulk_upload():
         
         success_count = 0
         error_count = 0
+        duplicate_count = 0
+        link_duplicates = request.form.get('duplicate_action') == 'link'
         
         for file in files:
             if file and allowed_file(file.filename):
@@ -224,41 +440,131 @@ def bulk_upload():
                     upload_folder = os.path.join(os.getcwd(), 'app', 'static', 'uploads')
                     os.makedirs(upload_folder, exist_ok=True)
                     file_path = os.path.join(upload_folder, secure_name)
-                    file.save(file_path)
+                    with timed('file_save'):
+                        file.save(file_path)
                     
                     api_key = session.get('gemini_api_key')
                     if not api_key:
                         continue
-                    extracted_data = extract_invoice_data(file_path, api_key)
                     
-                    invoice = Invoice(
-                        user_id=current_user.id,
-                        filename=original_filename,
-                        file_path=secure_name,
-                        invoice_number=extracted_data.get('invoice_number'),
-                        invoice_date=extracted_data.get('invoice_date'),
-                        vendor_name=extracted_data.get('vendor_name'),
-                        vendor_address=extracted_data.get('vendor_address'),
-                        customer_name=extracted_data.get('customer_name'),
-                        customer_address=extracted_data.get('customer_address'),
-                        subtotal=extracted_data.get('subtotal'),
-                        tax_amount=extracted_data.get('tax_amount'),
-                        total_amount=extracted_data.get('total_amount')
-                    )
-                    invoice.set_items(extracted_data.get('items', []))
+                    with timed('phash'):
+                        phash = compute_phash(file_path)
+                    duplicates = find_duplicates(phash)
+                    if duplicates and link_duplicates:
+                        os.remove(file_path)
+                        CACHE_HITS.labels(cache='duplicate').inc()
+                        duplicate_count += 1
+                        continue
+                    
+                    extracted_data = extraction_scheduler.run(current_user.id, BATCH, extract_invoice_data, file_path, api_key, current_app.config['PDF_TOKEN_BUDGET'])
+                    
+                    invoice = Invoice.from_extracted(current_user.id, original_filename, secure_name, extracted_data)
                     db.session.add(invoice)
+                    if add_fingerprint(invoice, phash, duplicates):
+                        duplicate_count += 1
                     success_count += 1
                 except Exception as e:
                     error_count += 1
                     if os.path.exists(file_path):
                         os.remove(file_path)
         
-        db.session.commit()
-        flash(f'Uploaded {success_count} invoices successfully. {error_count} failed.', 'success' if error_count == 0 else 'warning')
+        with timed('db_commit'):
+            db.session.commit()
+        message = f'Uploaded {success_count} invoices successfully. {error_count} failed.'
+        if duplicate_count:
+            action = 'linked to existing invoices' if link_duplicates else 'marked as duplicates'
+            message += f' {duplicate_count} near-duplicates {action}.'
+        flash(message, 'success' if error_count == 0 else 'warning')
         return redirect(url_for('main.dashboard'))
     
     return render_template('bulk_upload.html')
 
+@invoice_bp.route('/bulk-upload-zip', methods=['POST'])
+@login_required
+def bulk_upload_zip():
+    """Process a ZIP archive of invoices entry by entry as the request body streams in"""
+    api_key = session.get('gemini_api_key')
+    if not api_key:
+        return jsonify({'error': 'API key not found. Please logout and login again.'}), 401
+    
+    if request.mimetype not in ZIP_MIMETYPES:
+        return jsonify({'error': 'Send the archive as an application/zip request body'}), 415
+    
+    # Larger cap for this endpoint; each entry is still held to MAX_CONTENT_LENGTH
+    request.max_content_length = current_app.config['ZIP_MAX_CONTENT_LENGTH']
+    entry_limit = current_app.config['MAX_CONTENT_LENGTH']
+    link_duplicates = request.args.get('duplicate_action') == 'link'
+    
+    upload_folder = os.path.join(os.getcwd(), 'app', 'static', 'uploads')
+    os.makedirs(upload_folder, exist_ok=True)
+    counts = {'processed': 0, 'failed': 0, 'skipped': 0, 'duplicates': 0}
+    
+    try:
+        for entry in iter_zip_entries(request.stream):
+            if entry.is_dir or entry.name.startswith('__MACOSX/'):
+                continue
+            
+            original_filename = secure_filename(entry.name)
+            if not original_filename or not allowed_file(original_filename):
+                counts['skipped'] += 1
+                continue
+            
+            secure_name = generate_secure_filename(original_filename)
+            file_path = os.path.join(upload_folder, secure_name)
+            
+            try:
+                with timed('file_save'):
+                    _save_zip_entry(entry, file_path, entry_limit)
+                
+                with timed('phash'):
+                    phash = compute_phash(file_path)
+                duplicates = find_duplicates(phash)
+                if duplicates and link_duplicates:
+                    os.remove(file_path)
+                    CACHE_HITS.labels(cache='duplicate').inc()
+                    counts['duplicates'] += 1
+                    continue
+                
+                extracted_data = extraction_scheduler.run(current_user.id, BATCH, extract_invoice_data, file_path, api_key, current_app.config['PDF_TOKEN_BUDGET'])
+                invoice = Invoice.from_extracted(current_user.id, original_filename, secure_name, extracted_data)
+                db.session.add(invoice)
+                if add_fingerprint(invoice, phash, duplicates):
+                    counts['duplicates'] += 1
+                
+                counts['processed'] += 1
+                if counts['processed'] % ZIP_COMMIT_BATCH == 0:
+                    with timed('db_commit'):
+                        db.session.commit()
+            except ZipStreamError:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                raise
+            except Exception:
+                counts['failed'] += 1
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+    except (ZipStreamError, RequestEntityTooLarge) as e:
+        db.session.commit()
+        error = str(e) if isinstance(e, ZipStreamError) else 'Archive exceeds the upload size limit'
+        return jsonify({**counts, 'error': error}), 400
+    
+    with timed('db_commit'):
+        db.session.commit()
+    flash(f"Processed {counts['processed']} invoices from archive. {counts['failed']} failed, "
+          f"{counts['skipped']} skipped, {counts['duplicates']} near-duplicates.",
+          'success' if counts['failed'] == 0 else 'warning')
+    return jsonify({**counts, 'redirect': url_for('main.dashboard')})
+
+def _save_zip_entry(entry, file_path, max_size):
+    """Write an archive entry to disk chunk by chunk, enforcing a size cap"""
+    written = 0
+    with open(file_path, 'wb') as out:
+        for chunk in entry.iter_chunks():
+            written += len(chunk)
+            if written > max_size:
+                raise ValueError(f"{entry.name} exceeds the per-file size limit")
+            out.write(chunk)
+
 @invoice_bp.route('/bulk-delete', methods=['POST'])
 @login_required
 def bulk_delete():
@@ -336,7 +642,7 @@ def reprocess(invoice_id):
         if not api_key:
             flash('API key not found. Please logout and login again.', 'danger')
             return redirect(url_for('auth.logout'))
-        extracted_data = extract_invoice_data(file_path, api_key)
+        extracted_data = extraction_scheduler.run(current_user.id, BATCH, extract_invoice_data, file_path, api_key, current_app.config['PDF_TOKEN_BUDGET'])
         
         invoice.invoice_number = extracted_data.get('invoice_number')
         invoice.invoice_date = extracted_data.get('invoice_date')
@@ -349,7 +655,8 @@ def reprocess(invoice_id):
         invoice.total_amount = extracted_data.get('total_amount')
         invoice.set_items(extracted_data.get('items', []))
         
-        db.session.commit()
+        with timed('db_commit'):
+            db.session.commit()
         flash('Invoice reprocessed successfully', 'success')
     except Exception as e:
         flash(f'Error reprocessing invoice: {str(e)}', 'danger')
@@ -1,7 +1,10 @@
-from flask import Blueprint, render_template, redirect, url_for, request
+from flask import Blueprint, render_template, redirect, url_for, request, jsonify
 from flask_login import login_required, current_user
 from app import db
 from app.models.invoice import Invoice
+from app.utils.db_engine import use_replica
+from app.utils.typeahead import typeahead_cache, TYPEAHEAD_FIELDS, ALL_INVOICES
+from app.utils.scheduler import extraction_scheduler
 
 main_bp = Blueprint('main', __name__)
 
@@ -14,6 +17,7 @@ def index():
 
 @main_bp.route('/dashboard')
 @login_required
+@use_replica
 def dashboard():
     """User dashboard showing invoice history with search and filters"""
     # Get filter parameters
@@ -61,10 +65,41 @@ def dashboard():
     else:
         query = query.order_by(getattr(Invoice, sort_by).desc())
     
-    invoices = query.all()
+    invoices = query.options(db.joinedload(Invoice.user)).all()
     
     # Get unique categories for filter dropdown
     categories = db.session.query(Invoice.category).distinct().all()
     categories = [c[0] for c in categories if c[0]]
     
     return render_template('dashboard.html', invoices=invoices, categories=categories)
+
+@main_bp.route('/typeahead')
+@login_required
+@use_replica
+def typeahead():
+    """Vendor and customer name suggestions for a search prefix"""
+    prefix = request.args.get('q', '').strip()
+    field = request.args.get('field')
+    if not prefix or (field and field not in TYPEAHEAD_FIELDS):
+        return jsonify({'suggestions': []})
+    
+    user_id = None if current_user.is_admin() else current_user.id
+    suggestions = typeahead_cache.search(user_id or ALL_INVOICES, lambda: _load_names(user_id), prefix, field)
+    return jsonify({'suggestions': suggestions})
+
+def _load_names(user_id):
+    """Distinct vendor and customer names with their invoice counts"""
+    for field in TYPEAHEAD_FIELDS:
+        column = getattr(Invoice, field)
+        query = db.session.query(column, db.func.count()).group_by(column)
+        if user_id:
+            query = query.filter(Invoice.user_id == user_id)
+        for value, count in query:
+            yield field, value, count
+
+@main_bp.route('/extraction-queue')
+@login_required
+def extraction_queue():
+    """Queued extractions per user and priority; admins see every user"""
+    user_id = None if current_user.is_admin() else current_user.id
+    return jsonify({'queues': extraction_scheduler.snapshot(user_id)})
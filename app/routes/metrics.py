@@ -0,0 +1,15 @@
+from flask import Blueprint, Response, current_app, request, abort
+from app.utils.metrics import render_metrics
+import hmac
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint, protected by METRICS_TOKEN when set"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
@@ -0,0 +1,120 @@
+from app import db
+from app.models.invoice import Invoice
+from app.models.archived_invoice import ArchivedInvoice
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+from datetime import datetime, timedelta
+import zipfile
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+def archive_invoices(older_than_days, upload_folder, archive_folder, batch_size=200):
+    """
+    Move invoices created more than older_than_days ago into archived_invoices
+    Their files are packed into one compressed ZIP per upload month; returns the number archived
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    os.makedirs(archive_folder, exist_ok=True)
+    ensure_ids_never_reused()
+
+    archived_count = 0
+    while True:
+        batch = (Invoice.query
+                 .filter(Invoice.created_at < cutoff)
+                 .order_by(Invoice.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            break
+
+        by_month = {}
+        for invoice in batch:
+            by_month.setdefault(invoice.created_at.strftime('%Y-%m'), []).append(invoice)
+
+        packed_files = []
+        for month, invoices in by_month.items():
+            archive_name = f'invoices-{month}.zip'
+            packed = _pack_files(os.path.join(archive_folder, archive_name), invoices, upload_folder)
+            for invoice in invoices:
+                in_archive = invoice.file_path in packed
+                db.session.add(ArchivedInvoice.from_invoice(invoice, archive_name if in_archive else None))
+                db.session.delete(invoice)
+                if in_archive:
+                    packed_files.append(os.path.join(upload_folder, invoice.file_path))
+
+        db.session.commit()
+
+        # Originals go only once the archive rows are committed
+        for file_path in packed_files:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+        archived_count += len(batch)
+        logger.info(f"Archived {archived_count} invoices so far")
+
+    return archived_count
+
+def ensure_ids_never_reused():
+    """
+    Rebuild a SQLite invoices table created without AUTOINCREMENT, which hands deleted ids out again
+    Other databases never reuse sequence values; returns True if the table was rebuilt
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    schema = db.session.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'invoices'")).scalar()
+    if schema is None or 'AUTOINCREMENT' in schema.upper():
+        return False
+
+    connection = db.session.connection()
+    # pysqlite only opens a transaction before DML, so the CREATE TABLE would otherwise commit on its own
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN')
+    try:
+        # Build the new table under a temporary name so foreign keys elsewhere keep pointing at "invoices"
+        connection.execute(text('DROP TABLE IF EXISTS invoices_rebuild'))
+        create = str(CreateTable(Invoice.__table__).compile(dialect=db.engine.dialect))
+        connection.execute(text(create.replace('CREATE TABLE invoices ', 'CREATE TABLE invoices_rebuild ', 1)))
+        columns = ', '.join(column.name for column in Invoice.__table__.columns)
+        connection.execute(text(f'INSERT INTO invoices_rebuild ({columns}) SELECT {columns} FROM invoices'))
+        connection.execute(text('DROP TABLE invoices'))
+        connection.execute(text('ALTER TABLE invoices_rebuild RENAME TO invoices'))
+
+        # Continue numbering above every id handed out so far, hot or archived
+        last_id = max(
+            db.session.query(db.func.max(Invoice.id)).scalar() or 0,
+            db.session.query(db.func.max(ArchivedInvoice.id)).scalar() or 0,
+        )
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = 'invoices'"))
+        connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('invoices', :seq)"), {'seq': last_id})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info(f"Rebuilt invoices table with AUTOINCREMENT; new ids start after {last_id}")
+    return True
+
+def _pack_files(archive_path, invoices, upload_folder):
+    """Append invoice files to a month archive; returns the member names it holds"""
+    with zipfile.ZipFile(archive_path, 'a', compression=zipfile.ZIP_DEFLATED) as archive:
+        members = set(archive.namelist())
+        for invoice in invoices:
+            source = os.path.join(upload_folder, invoice.file_path)
+            if invoice.file_path not in members and os.path.exists(source):
+                archive.write(source, arcname=invoice.file_path)
+                members.add(invoice.file_path)
+    return members
+
+def read_archived_file(archive_folder, archived_invoice):
+    """Original upload bytes of an archived invoice, or None if it was never packed"""
+    if not archived_invoice.archive_file:
+        return None
+    archive_path = os.path.join(archive_folder, archived_invoice.archive_file)
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            return archive.read(archived_invoice.file_path)
+    except (OSError, KeyError):
+        return None
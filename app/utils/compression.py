@@ -0,0 +1,84 @@
+from flask import request
+from werkzeug.security import safe_join
+import gzip
+import hashlib
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'text/html', 'application/json', 'text/css', 'text/plain', 'application/javascript'}
+STATIC_MAX_AGE = 31536000
+
+_static_hashes = {}
+
+def init_compression(app):
+    """Register response compression and fingerprinted static URLs"""
+
+    @app.after_request
+    def compress_response(response):
+        return _compress(response, app.config['COMPRESS_MIN_SIZE'])
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and 'v' not in values:
+            version = _static_hash(app, values.get('filename', ''))
+            if version:
+                values['v'] = version
+
+    @app.after_request
+    def cache_static(response):
+        if request.endpoint == 'static' and response.status_code == 200:
+            version = request.args.get('v')
+            if version and version == _static_hash(app, request.view_args.get('filename', '')):
+                response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+        return response
+
+def _compress(response, min_size):
+    """Brotli or gzip encode HTML/JSON bodies above min_size bytes"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        encoding, compressed = 'br', brotli.compress(data, quality=5)
+    elif accepted['gzip']:
+        encoding, compressed = 'gzip', gzip.compress(data, compresslevel=6)
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def _static_hash(app, filename):
+    """Short content hash of a static file; uploads are already uniquely named"""
+    if not filename or filename.startswith('uploads/'):
+        return None
+
+    path = safe_join(app.static_folder, filename)
+    if path is None:
+        return None
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _static_hashes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'rb') as static_file:
+        version = hashlib.sha256(static_file.read()).hexdigest()[:12]
+    _static_hashes[path] = (mtime, version)
+    return version
@@ -0,0 +1,128 @@
+from flask import g, has_app_context, has_request_context, current_app, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, Insert, Update, Delete
+from sqlalchemy.engine import Engine
+from functools import wraps
+import sqlite3
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_KEY = 'replica'
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    # Wait up to 30s for a lock; this replaces sqlite3's connect timeout, so it is the only one set
+    ('busy_timeout', 30000),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', -16000),
+)
+
+def configure_database(app, database_url):
+    """
+    Set engine options for the configured database
+    SQLite gets WAL pragmas on connect, PostgreSQL gets pool sizing and pre-ping
+    """
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(database_url)
+
+    replica_url = _normalize_url(os.environ.get('DATABASE_REPLICA_URL', ''))
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {
+            REPLICA_BIND_KEY: {'url': replica_url, **_engine_options(replica_url)}
+        }
+        logger.info("Read replica routing enabled")
+
+def _normalize_url(database_url):
+    """Rewrite legacy postgres:// scheme for SQLAlchemy"""
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    return database_url
+
+def _engine_options(database_url):
+    """Engine keyword arguments for the given database URL"""
+    if database_url.startswith('sqlite'):
+        # Lock waits are set by the busy_timeout pragma
+        return {}
+
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_pre_ping': True,
+    }
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Enable WAL so readers don't block on a writer"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+def init_replica_routing(app, db):
+    """Remember when a user last committed a write, so use_replica can read their own writes"""
+    listeners = [
+        (db.session, 'after_flush', _mark_write),
+        (db.session, 'do_orm_execute', _mark_bulk_write),
+        (db.session, 'after_commit', _remember_write),
+        (db.session, 'after_rollback', _forget_write),
+    ]
+    for target, name, listener in listeners:
+        if not event.contains(target, name, listener):
+            event.listen(target, name, listener)
+
+def _mark_write(session, flush_context):
+    session.info['wrote'] = True
+
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+def _remember_write(session):
+    if session.info.pop('wrote', False) and has_request_context() and _replica_configured():
+        flask_session['last_write_at'] = time.time()
+
+def _forget_write(session):
+    session.info.pop('wrote', None)
+
+def _replica_configured():
+    return REPLICA_BIND_KEY in current_app.config.get('SQLALCHEMY_BINDS', {})
+
+def use_replica(view):
+    """
+    Route queries issued by a read-only view to the replica, if configured
+    Users who wrote within REPLICA_STICKY_SECONDS stay on the primary, so replica lag never hides their changes
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        last_write_at = flask_session.get('last_write_at')
+        if last_write_at is None or time.time() - last_write_at >= current_app.config['REPLICA_STICKY_SECONDS']:
+            g.use_replica = True
+        return view(*args, **kwargs)
+    return wrapped
+
+class RoutingSession(Session):
+    """Session that sends reads from replica-marked views to the replica bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            engines = self._db.engines
+            if REPLICA_BIND_KEY in engines:
+                return engines[REPLICA_BIND_KEY]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        """Writes and flushes always go to the primary"""
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return False
+        return has_app_context() and g.get('use_replica', False)
@@ -1,18 +1,30 @@
 import google.generativeai as genai
 from PIL import Image
 import PyPDF2
+from app.utils.metrics import timed, RATE_LIMIT_REJECTIONS
+from app.utils.text_compactor import compact_pdf_text
 import json
 import logging
+import threading
 import time
 
 logger = logging.getLogger(__name__)
 
+# Shared budget of Gemini calls per rolling minute
+GEMINI_CALLS_PER_MINUTE = 30
+
 _api_call_cache = {}
+_api_call_lock = threading.Lock()
+
+class RateLimitExceeded(Exception):
+    """Raised when the shared Gemini call budget is used up"""
 
-def extract_invoice_data(file_path, api_key=None):
+@timed('extract')
+def extract_invoice_data(file_path, api_key=None, token_budget=None):
     """
     Extract structured invoice data using Google Gemini AI
     API key is used only for this request and never stored
+    token_budget caps the PDF text sent to the model; None or 0 sends it all
     """
     if not api_key or not isinstance(api_key, str):
         raise ValueError("Valid Gemini API key is required")
@@ -53,27 +65,34 @@ Extract all available information. If any field is not found, use "N/A".
 Return ONLY valid JSON, no additional text.'''
         
         if file_ext == 'pdf':
-            with open(file_path, 'rb') as pdf_file:
+            with timed('pdf_parse'), open(file_path, 'rb') as pdf_file:
                 pdf_reader = PyPDF2.PdfReader(pdf_file)
-                text = ''.join(page.extract_text() for page in pdf_reader.pages)
+                pages = [page.extract_text() or '' for page in pdf_reader.pages]
+            
+            with timed('pdf_compact'):
+                text = compact_pdf_text(pages, token_budget)
             
             if not text.strip():
                 raise ValueError("PDF contains no extractable text")
             
-            response = model.generate_content([prompt, f"\n\nInvoice Text:\n{text}"])
+            with timed('gemini_call'):
+                response = model.generate_content([prompt, f"\n\nInvoice Text:\n{text}"])
         else:
             image = Image.open(file_path)
-            response = model.generate_content([prompt, image])
-        
-        response_text = response.text.strip()
-        response_text = response_text.removeprefix('```json').removeprefix('```').removesuffix('```').strip()
+            with timed('gemini_call'):
+                response = model.generate_content([prompt, image])
         
-        extracted_data = json.loads(response_text)
+        with timed('json_parse'):
+            response_text = response.text.strip()
+            response_text = response_text.removeprefix('```json').removeprefix('```').removesuffix('```').strip()
+            extracted_data = json.loads(response_text)
         logger.info("Invoice data extracted successfully")
         
         _sanitize_extracted_data(extracted_data)
         return extracted_data
     
+    except RateLimitExceeded:
+        raise
     except json.JSONDecodeError:
         logger.error("JSON parsing error")
         raise ValueError("Failed to parse AI response")
@@ -102,10 +121,12 @@ def _sanitize_extracted_data(data):
 def _rate_limit_check():
     """Simple rate limiting for API calls"""
     global _api_call_cache
-    now = time.time()
-    _api_call_cache = {k: v for k, v in _api_call_cache.items() if now - v < 60}
-    
-    if len(_api_call_cache) >= 30:
-        raise Exception("Rate limit exceeded. Please wait.")
-    
-    _api_call_cache[now] = now
+    with _api_call_lock:
+        now = time.time()
+        _api_call_cache = {k: v for k, v in _api_call_cache.items() if now - v < 60}
+        
+        if len(_api_call_cache) >= GEMINI_CALLS_PER_MINUTE:
+            RATE_LIMIT_REJECTIONS.inc()
+            raise RateLimitExceeded("Rate limit exceeded. Please wait.")
+        
+        _api_call_cache[now] = now
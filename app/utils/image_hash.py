@@ -0,0 +1,71 @@
+from PIL import Image
+import PyPDF2
+from io import BytesIO
+import logging
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 16
+BUCKET_COUNT = 32
+BUCKET_BITS = HASH_SIZE * HASH_SIZE // BUCKET_COUNT
+
+def compute_phash(file_path):
+    """
+    Compute a 256-bit difference hash of an invoice image
+    PDFs use the first embedded image of page one; text-only PDFs return None
+    Invoices printed from one template hash alike, so a match is only a candidate to confirm
+    """
+    try:
+        image = _load_image(file_path)
+        if image is None:
+            return None
+        return _dhash(image)
+    except Exception as e:
+        logger.warning(f"Perceptual hash failed: {type(e).__name__}")
+        return None
+
+def _load_image(file_path):
+    """Open the image, or the first scanned page image of a PDF"""
+    if file_path.rsplit('.', 1)[1].lower() != 'pdf':
+        return Image.open(file_path)
+
+    with open(file_path, 'rb') as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        if not pdf_reader.pages:
+            return None
+        images = pdf_reader.pages[0].images
+        if not images:
+            return None
+        return Image.open(BytesIO(images[0].data))
+
+def _dhash(image):
+    """Compare adjacent pixels of a downscaled grayscale image"""
+    small = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+def split_buckets(phash):
+    """
+    Split a hash into BUCKET_BITS-wide buckets for multi-index lookup
+    Any hash within BUCKET_COUNT - 1 bits shares at least one bucket exactly
+    """
+    mask = (1 << BUCKET_BITS) - 1
+    return [(phash >> (BUCKET_BITS * i)) & mask for i in range(BUCKET_COUNT)]
+
+def informative_buckets(phash):
+    """
+    (position, value) of the buckets worth indexing
+    All-zero and all-one buckets come from blank paper and flat margins, which most
+    document scans share, so matching on them selects nearly every invoice
+    """
+    constant = (0, (1 << BUCKET_BITS) - 1)
+    return [(i, value) for i, value in enumerate(split_buckets(phash)) if value not in constant]
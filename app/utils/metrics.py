@@ -0,0 +1,54 @@
+from flask import g, has_request_context
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from contextlib import contextmanager
+import os
+import time
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    'invoice_stage_seconds', 'Time spent in each invoice pipeline stage',
+    ['stage'], buckets=STAGE_BUCKETS
+)
+ERRORS = Counter('invoice_errors_total', 'Pipeline errors by stage and exception type', ['stage', 'error_type'])
+RATE_LIMIT_REJECTIONS = Counter('invoice_rate_limit_rejections_total', 'Gemini calls rejected by the rate limiter')
+CACHE_HITS = Counter('invoice_cache_hits_total', 'Work avoided by a cache or lookup', ['cache'])
+
+@contextmanager
+def timed(stage):
+    """
+    Time a pipeline stage into the histogram and the request's Server-Timing
+    Exceptions are counted by type and re-raised
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.labels(stage=stage, error_type=type(e).__name__).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        if has_request_context():
+            timings = g.setdefault('server_timing', {})
+            timings[stage] = timings.get(stage, 0) + elapsed
+
+def add_server_timing(response):
+    """Attach the stage breakdown of this request as a Server-Timing header"""
+    timings = g.get('server_timing')
+    if timings:
+        response.headers['Server-Timing'] = ', '.join(
+            f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in timings.items()
+        )
+    return response
+
+def render_metrics():
+    """Exposition text, aggregated across gunicorn workers in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
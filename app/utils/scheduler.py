@@ -0,0 +1,150 @@
+from prometheus_client import Gauge, Histogram
+from app.utils.gemini_extractor import RateLimitExceeded, GEMINI_CALLS_PER_MINUTE
+from collections import deque
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+# A second of slack over the extractor's own 60s window, so a granted call is never rejected there
+WINDOW_SECONDS = 61
+
+# Per-user detail stays in snapshot(); user labels would make one series per user
+QUEUE_DEPTH = Gauge(
+    'invoice_scheduler_queue_depth', 'Extractions waiting for a Gemini slot',
+    ['priority'], multiprocess_mode='livesum'
+)
+WAIT_SECONDS = Histogram(
+    'invoice_scheduler_wait_seconds', 'Time an extraction waited for a Gemini slot',
+    ['priority'], buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+
+class _Ticket:
+    __slots__ = ('user_id', 'priority', 'enqueued_at')
+
+    def __init__(self, user_id, priority):
+        self.user_id = user_id
+        self.priority = priority
+        self.enqueued_at = time.time()
+
+class ExtractionScheduler:
+    """
+    Share the Gemini call budget fairly between users
+    Each priority class has per-user FIFO queues served round-robin; interactive work gets
+    interactive_weight turns for every batch turn while both classes are waiting
+    """
+
+    def __init__(self, calls_per_minute=GEMINI_CALLS_PER_MINUTE, interactive_weight=3, max_wait=300):
+        self.calls_per_minute = calls_per_minute
+        self._condition = threading.Condition()
+        self._queues = {INTERACTIVE: {}, BATCH: {}}
+        self._rotation = {INTERACTIVE: deque(), BATCH: deque()}
+        self._granted = deque()
+        self.configure(interactive_weight, max_wait)
+
+    def configure(self, interactive_weight, max_wait):
+        """Set the interactive share and queue timeout, restarting the current weighting round"""
+        with self._condition:
+            self.interactive_weight = interactive_weight
+            self.max_wait = max_wait
+            self._credits = interactive_weight
+
+    def run(self, user_id, priority, fn, *args, **kwargs):
+        """Wait for this user's turn under the shared budget, then call fn"""
+        ticket = self._enqueue(user_id, priority)
+        self._wait_for_turn(ticket)
+        WAIT_SECONDS.labels(priority=priority).observe(time.time() - ticket.enqueued_at)
+        return fn(*args, **kwargs)
+
+    def snapshot(self, user_id=None):
+        """Queue depth and oldest wait per user and priority, for status pages"""
+        now = time.time()
+        status = {}
+        with self._condition:
+            for priority, queues in self._queues.items():
+                for queued_user, tickets in queues.items():
+                    if user_id is not None and queued_user != user_id:
+                        continue
+                    status.setdefault(queued_user, {})[priority] = {
+                        'depth': len(tickets),
+                        'oldest_wait': round(now - tickets[0].enqueued_at, 3),
+                    }
+        return status
+
+    def _enqueue(self, user_id, priority):
+        ticket = _Ticket(user_id, priority)
+        with self._condition:
+            queues = self._queues[priority]
+            if user_id not in queues:
+                queues[user_id] = deque()
+                self._rotation[priority].append(user_id)
+            queues[user_id].append(ticket)
+            QUEUE_DEPTH.labels(priority=priority).inc()
+        return ticket
+
+    def _wait_for_turn(self, ticket):
+        deadline = ticket.enqueued_at + self.max_wait
+        with self._condition:
+            while True:
+                now = time.time()
+                while self._granted and now - self._granted[0] >= WINDOW_SECONDS:
+                    self._granted.popleft()
+
+                if self._next_ticket() is ticket and len(self._granted) < self.calls_per_minute:
+                    self._grant(ticket, now)
+                    return
+
+                if now >= deadline:
+                    self._remove(ticket)
+                    logger.warning(f"Extraction for user {ticket.user_id} gave up after {self.max_wait}s in queue")
+                    raise RateLimitExceeded("Extraction queue is busy. Please retry later.")
+
+                # Sleep until a budget slot frees up, or until woken by another grant
+                timeout = deadline - now
+                if self._granted and len(self._granted) >= self.calls_per_minute:
+                    timeout = min(timeout, WINDOW_SECONDS - (now - self._granted[0]))
+                self._condition.wait(timeout)
+
+    def _next_ticket(self):
+        """The ticket weighted round-robin would serve next"""
+        interactive_waiting = bool(self._rotation[INTERACTIVE])
+        batch_waiting = bool(self._rotation[BATCH])
+        if interactive_waiting and (not batch_waiting or self._credits > 0):
+            priority = INTERACTIVE
+        elif batch_waiting:
+            priority = BATCH
+        else:
+            return None
+        user_id = self._rotation[priority][0]
+        return self._queues[priority][user_id][0]
+
+    def _grant(self, ticket, now):
+        self._granted.append(now)
+        if ticket.priority == BATCH:
+            self._credits = self.interactive_weight
+        elif self._rotation[BATCH]:
+            self._credits -= 1
+
+        self._remove(ticket)
+        # Move this user to the back of the rotation if they still have work queued
+        rotation = self._rotation[ticket.priority]
+        if ticket.user_id in self._queues[ticket.priority]:
+            rotation.remove(ticket.user_id)
+            rotation.append(ticket.user_id)
+        self._condition.notify_all()
+
+    def _remove(self, ticket):
+        queues = self._queues[ticket.priority]
+        tickets = queues[ticket.user_id]
+        tickets.remove(ticket)
+        if not tickets:
+            del queues[ticket.user_id]
+            self._rotation[ticket.priority].remove(ticket.user_id)
+        QUEUE_DEPTH.labels(priority=ticket.priority).dec()
+        self._condition.notify_all()
+
+extraction_scheduler = ExtractionScheduler()
@@ -0,0 +1,113 @@
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+from collections import Counter
+from contextlib import contextmanager
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+_recorders = []
+
+class QueryRecorder:
+    """Statements and durations captured while a recorder is active"""
+
+    def __init__(self):
+        self.queries = []
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated(self, threshold):
+        """Statement shapes executed at least threshold times"""
+        shapes = Counter(statement for statement, _, _ in self.queries)
+        return {statement: n for statement, n in shapes.items() if n >= threshold}
+
+def init_sql_profiler(app):
+    """
+    Count and time queries per request when SQL_PROFILING is enabled
+    Logs repeated statement shapes as likely N+1 patterns, and slow queries with parameters
+    """
+    if not app.config.get('SQL_PROFILING'):
+        return
+
+    with app.app_context():
+        _install_listeners(app)
+
+    @app.before_request
+    def start_sql_profile():
+        g.sql_profile = QueryRecorder()
+
+    @app.after_request
+    def report_sql_profile(response):
+        profile = g.get('sql_profile')
+        if profile is None:
+            return response
+
+        elapsed = sum(duration for _, _, duration in profile.queries)
+        timings = g.setdefault('server_timing', {})
+        timings['sql'] = timings.get('sql', 0) + elapsed
+
+        threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        for statement, n in profile.repeated(threshold).items():
+            logger.warning(f"Possible N+1 in {request.endpoint}: {n} x {_shorten(statement)}")
+        logger.info(f"{request.endpoint}: {profile.count} queries in {elapsed * 1000:.1f}ms")
+        return response
+
+def _install_listeners(app):
+    """Attach timing hooks to every engine of the app, once"""
+    for engine in app.extensions['sqlalchemy'].engines.values():
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_started'].pop()
+    query = (statement, parameters, duration)
+
+    for recorder in _recorders:
+        recorder.queries.append(query)
+
+    if not has_request_context():
+        return
+    profile = g.get('sql_profile')
+    if profile is not None:
+        profile.queries.append(query)
+
+    if duration * 1000 >= current_app.config['SQL_SLOW_QUERY_MS']:
+        logger.warning(f"Slow query ({duration * 1000:.1f}ms) in {request.endpoint}: "
+                       f"{_shorten(statement)} params={parameters!r}")
+
+def _shorten(statement, limit=200):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+@contextmanager
+def count_queries(app):
+    """Record every query issued inside the block, e.g. around test_client calls"""
+    with app.app_context():
+        _install_listeners(app)
+
+    recorder = QueryRecorder()
+    _recorders.append(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorders.remove(recorder)
+
+@contextmanager
+def assert_max_queries(app, max_count):
+    """
+    Fail if the block issues more than max_count queries
+    Usage: with assert_max_queries(app, 5): client.get('/dashboard')
+    """
+    with count_queries(app) as recorder:
+        yield recorder
+
+    if recorder.count > max_count:
+        statements = '\n'.join(_shorten(statement) for statement, _, _ in recorder.queries)
+        raise AssertionError(f"Expected at most {max_count} queries, got {recorder.count}:\n{statements}")
@@ -0,0 +1,145 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+# A terms section never swallows more than this many lines
+TERMS_MAX_LINES = 15
+# Lines this close to the top or bottom of a page count as header/footer
+EDGE_LINES = 3
+
+_WHITESPACE = re.compile(r'[ \t\f\v\u00a0]+')
+_NUMBER = re.compile(r'\d+(?:[.,]\d+)*')
+_AMOUNT = re.compile(r'\d[\d,]*[.,]\d{2}\b')
+_PAGE_NUMBER = re.compile(r'^(page\s*\d+(\s*(of|/)\s*\d+)?|\d+\s+of\s+\d+)$', re.IGNORECASE)
+_BOILERPLATE_LINE = re.compile(
+    r'(computer[- ]generated|does not require (a )?signature|thank you for your business'
+    r'|e\.?\s*&\s*o\.?\s*e)', re.IGNORECASE
+)
+_BOILERPLATE_HEADING = re.compile(r'^(general\s+)?terms\s*(and|&)\s*conditions\s*:?$', re.IGNORECASE)
+
+def compact_pdf_text(pages, token_budget=None):
+    """
+    Shrink per-page PDF text before it is sent to the model
+    Collapses whitespace, drops lines repeated across pages and boilerplate blocks,
+    then keeps the most number-dense pages that fit the token budget
+    """
+    original_size = sum(len(page) for page in pages)
+
+    blocks_per_page = [_drop_boilerplate(_split_blocks(page)) for page in pages]
+    blocks_per_page = _drop_repeated_lines(blocks_per_page)
+    compacted = ['\n'.join('\n'.join(block) for block in blocks) for blocks in blocks_per_page]
+    compacted = [page for page in compacted if page]
+
+    if token_budget:
+        compacted = _fit_budget(compacted, token_budget * CHARS_PER_TOKEN)
+
+    text = '\n\n'.join(compacted)
+    logger.info(
+        f"Compacted PDF text from {original_size} to {len(text)} chars "
+        f"(~{original_size // CHARS_PER_TOKEN} to ~{len(text) // CHARS_PER_TOKEN} tokens)"
+    )
+    return text
+
+def _split_blocks(page):
+    """Normalized non-empty lines, grouped into blank-line separated blocks"""
+    blocks, current = [], []
+    for line in page.splitlines():
+        line = _WHITESPACE.sub(' ', line).strip()
+        if line:
+            current.append(line)
+        elif current:
+            blocks.append(current)
+            current = []
+    if current:
+        blocks.append(current)
+    return blocks
+
+def _drop_boilerplate(blocks):
+    """
+    Remove terms and conditions sections, page counters and stock footer lines
+    A section starts at a line that is only the heading, anywhere on the page, and runs over
+    the prose after it; PDF text often has no blank lines, so it ends at the first line that
+    is short or holds an amount, or after TERMS_MAX_LINES
+    """
+    kept = []
+    terms_lines = None
+    for block in blocks:
+        block_kept = []
+        for line in block:
+            if _BOILERPLATE_HEADING.match(line):
+                terms_lines = 0
+                continue
+            if terms_lines is not None:
+                if terms_lines < TERMS_MAX_LINES and _is_terms_prose(line):
+                    terms_lines += 1
+                    continue
+                terms_lines = None
+            if not _PAGE_NUMBER.match(line) and not _BOILERPLATE_LINE.search(line):
+                block_kept.append(line)
+        if block_kept:
+            kept.append(block_kept)
+    return kept
+
+def _is_terms_prose(line):
+    """Sentence-like text without amounts, as in numbered terms clauses"""
+    return len(line.split()) >= 5 and not _AMOUNT.search(line)
+
+def _drop_repeated_lines(blocks_per_page):
+    """
+    Keep only the first occurrence of lines repeated across pages
+    A repeated line with an amount may be a real line item, so it is only dropped when it sits
+    in the header or footer position of most pages
+    """
+    if len(blocks_per_page) < 2:
+        return blocks_per_page
+
+    page_counts, header_counts, footer_counts = {}, {}, {}
+    for blocks in blocks_per_page:
+        lines = [line for block in blocks for line in block]
+        for counts, subset in ((page_counts, lines), (header_counts, lines[:EDGE_LINES]),
+                               (footer_counts, lines[-EDGE_LINES:])):
+            for line in set(subset):
+                counts[line] = counts.get(line, 0) + 1
+
+    most_pages = len(blocks_per_page) // 2 + 1
+    repeated = {
+        line for line, count in page_counts.items()
+        if count > 1 and (not _AMOUNT.search(line) or header_counts.get(line, 0) >= most_pages
+                          or footer_counts.get(line, 0) >= most_pages)
+    }
+
+    seen = set()
+    result = []
+    for blocks in blocks_per_page:
+        kept_blocks = []
+        for block in blocks:
+            kept = []
+            for line in block:
+                if line in repeated:
+                    if line in seen:
+                        continue
+                    seen.add(line)
+                kept.append(line)
+            if kept:
+                kept_blocks.append(kept)
+        result.append(kept_blocks)
+    return result
+
+def _fit_budget(pages, char_budget):
+    """Keep the pages with the most numbers, in original order, within char_budget"""
+    if sum(len(page) for page in pages) <= char_budget:
+        return pages
+
+    ranked = sorted(range(len(pages)), key=lambda i: len(_NUMBER.findall(pages[i])), reverse=True)
+    chosen, used = set(), 0
+    for i in ranked:
+        if used + len(pages[i]) <= char_budget:
+            chosen.add(i)
+            used += len(pages[i])
+
+    if not chosen:
+        # A single page over budget: keep the head of the densest one
+        return [pages[ranked[0]][:char_budget]]
+    return [pages[i] for i in sorted(chosen)]
@@ -0,0 +1,173 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from collections import OrderedDict
+from bisect import bisect_left, insort
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+TYPEAHEAD_FIELDS = ('vendor_name', 'customer_name')
+ALL_INVOICES = 'all'
+
+class PrefixIndex:
+    """
+    Case-insensitive prefix lookup over names, ranked by how often they occur
+    Not thread-safe; TypeaheadCache serializes every read and write of its indexes
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, field, value, count=1):
+        if not value or value == 'N/A':
+            return
+        key = (value.lower(), field)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = [value, count]
+            insort(self._keys, key)
+        else:
+            entry[1] += count
+
+    def remove(self, field, value):
+        if not value:
+            return
+        key = (value.lower(), field)
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._entries[key]
+            del self._keys[bisect_left(self._keys, key)]
+
+    def search(self, prefix, field=None, limit=10):
+        """Top suggestions starting with prefix, most frequent first"""
+        prefix = prefix.lower()
+        matches = []
+        for i in range(bisect_left(self._keys, (prefix,)), len(self._keys)):
+            key = self._keys[i]
+            if not key[0].startswith(prefix):
+                break
+            if field is None or key[1] == field:
+                value, count = self._entries[key]
+                matches.append({'value': value, 'field': key[1], 'count': count})
+        matches.sort(key=lambda match: -match['count'])
+        return matches[:limit]
+
+class TypeaheadCache:
+    """
+    Per-scope prefix indexes, built lazily and kept current from committed invoice changes
+    Least recently used indexes are dropped once the total entry count exceeds max_entries
+    """
+
+    def __init__(self, max_entries=200000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope, loader):
+        """Index for a scope (a user id or ALL_INVOICES), building it with loader() if needed"""
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is not None and time.time() - index.built_at < self.ttl:
+                self._indexes.move_to_end(scope)
+                return index
+
+        index = PrefixIndex()
+        for field, value, count in loader():
+            index.add(field, value, count)
+
+        with self._lock:
+            self._indexes[scope] = index
+            self._indexes.move_to_end(scope)
+            self._evict()
+        return index
+
+    def search(self, scope, loader, prefix, field=None, limit=10):
+        """Suggestions from a scope's index, searched under the lock that apply() edits it under"""
+        index = self.get(scope, loader)
+        with self._lock:
+            return index.search(prefix, field, limit)
+
+    def apply(self, changes):
+        """Apply (user_id, field, old, new) changes to any loaded index they affect"""
+        with self._lock:
+            for user_id, field, old, new in changes:
+                for scope in (user_id, ALL_INVOICES):
+                    index = self._indexes.get(scope)
+                    if index is not None:
+                        index.remove(field, old)
+                        index.add(field, new)
+
+    def invalidate(self, user_id=None):
+        """Drop the indexes for a user (and the all-invoices index), or everything"""
+        with self._lock:
+            if user_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(user_id, None)
+                self._indexes.pop(ALL_INVOICES, None)
+
+    def _evict(self):
+        total = sum(len(index) for index in self._indexes.values())
+        while total > self.max_entries and len(self._indexes) > 1:
+            scope, index = self._indexes.popitem(last=False)
+            total -= len(index)
+            logger.info(f"Evicted typeahead index for {scope} ({len(index)} entries)")
+
+typeahead_cache = TypeaheadCache()
+
+def init_typeahead(app, db, invoice_model):
+    """Size the cache from config and follow committed Invoice inserts, edits and deletes"""
+    typeahead_cache.max_entries = app.config['TYPEAHEAD_MAX_ENTRIES']
+    typeahead_cache.ttl = app.config['TYPEAHEAD_TTL']
+
+    listeners = [
+        (invoice_model, 'after_insert', _invoice_inserted),
+        (invoice_model, 'after_update', _invoice_updated),
+        (invoice_model, 'after_delete', _invoice_deleted),
+        (db.session, 'after_commit', _apply_changes),
+        (db.session, 'after_rollback', _discard_changes),
+    ]
+    for target, name, listener in listeners:
+        if not event.contains(target, name, listener):
+            event.listen(target, name, listener)
+
+def _record(target, changes):
+    """Queue index changes on the session until it commits"""
+    session = object_session(target)
+    if session is not None and changes:
+        session.info.setdefault('typeahead_changes', []).extend(changes)
+
+def _invoice_inserted(mapper, connection, target):
+    _record(target, [(target.user_id, field, None, getattr(target, field)) for field in TYPEAHEAD_FIELDS])
+
+def _invoice_updated(mapper, connection, target):
+    changes = []
+    state = inspect(target)
+    for field in TYPEAHEAD_FIELDS:
+        history = state.attrs[field].history
+        if history.has_changes():
+            old = history.deleted[0] if history.deleted else None
+            changes.append((target.user_id, field, old, getattr(target, field)))
+    _record(target, changes)
+
+def _invoice_deleted(mapper, connection, target):
+    _record(target, [(target.user_id, field, getattr(target, field), None) for field in TYPEAHEAD_FIELDS])
+
+def _apply_changes(session):
+    changes = session.info.pop('typeahead_changes', None)
+    if changes:
+        typeahead_cache.apply(changes)
+
+def _discard_changes(session):
+    session.info.pop('typeahead_changes', None)
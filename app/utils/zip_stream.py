@@ -0,0 +1,179 @@
+import struct
+import zlib
+
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+DATA_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+# Where the entries end: the central directory, or the end record of an empty archive
+END_SIGNATURES = (b'PK\x01\x02', b'PK\x05\x06')
+LOCAL_HEADER = struct.Struct('<HHHHHIIIHH')
+
+FLAG_ENCRYPTED = 0x1
+FLAG_DATA_DESCRIPTOR = 0x8
+FLAG_UTF8 = 0x800
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+
+class ZipStreamError(ValueError):
+    """Raised when an archive cannot be read as a forward-only stream"""
+
+class ZipEntry:
+    """
+    A single archive member read straight off the stream
+    Must be consumed (or drained) before the next entry is available
+    """
+
+    def __init__(self, reader, name, flags, method, crc, compressed_size, chunk_size):
+        self.name = name
+        self._reader = reader
+        self._flags = flags
+        self._method = method
+        self._crc = crc
+        self._compressed_size = compressed_size
+        self._chunk_size = chunk_size
+        self._chunks = None
+
+    @property
+    def is_dir(self):
+        return self.name.endswith('/')
+
+    def iter_chunks(self):
+        """Yield decompressed data in chunks of at most chunk_size bytes"""
+        if self._chunks is not None:
+            raise ZipStreamError(f"Entry {self.name} already read")
+        self._chunks = self._read_chunks()
+        return self._chunks
+
+    def drain(self):
+        """Skip whatever is left of this entry, even if partly read"""
+        if self._chunks is None:
+            self._chunks = self._read_chunks()
+        for _ in self._chunks:
+            pass
+
+    def _read_chunks(self):
+        crc = 0
+        for chunk in self._iter_raw():
+            crc = zlib.crc32(chunk, crc)
+            yield chunk
+
+        if self._flags & FLAG_DATA_DESCRIPTOR:
+            self._crc = self._read_data_descriptor()
+        if crc != self._crc:
+            raise ZipStreamError(f"CRC mismatch in {self.name}")
+
+    def _iter_raw(self):
+        if self._method == METHOD_STORED:
+            if self._flags & FLAG_DATA_DESCRIPTOR:
+                raise ZipStreamError(f"Stored entry {self.name} has no size in its header")
+            remaining = self._compressed_size
+            while remaining:
+                chunk = self._reader.read_exact(min(remaining, self._chunk_size))
+                remaining -= len(chunk)
+                yield chunk
+        elif self._method == METHOD_DEFLATED:
+            yield from self._iter_inflate()
+        else:
+            raise ZipStreamError(f"Unsupported compression method {self._method} in {self.name}")
+
+    def _iter_inflate(self):
+        """Inflate until the deflate stream ends, bounding output per step"""
+        inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        known_size = not self._flags & FLAG_DATA_DESCRIPTOR
+        remaining = self._compressed_size
+
+        while not inflater.eof:
+            size = min(remaining, self._chunk_size) if known_size else self._chunk_size
+            data = self._reader.read_some(size)
+            if not data:
+                raise ZipStreamError(f"Archive truncated in {self.name}")
+            if known_size:
+                remaining -= len(data)
+
+            while data and not inflater.eof:
+                chunk = inflater.decompress(data, self._chunk_size)
+                if chunk:
+                    yield chunk
+                data = inflater.unconsumed_tail
+
+        if inflater.unused_data:
+            self._reader.unread(inflater.unused_data)
+
+    def _read_data_descriptor(self):
+        """Read the trailing CRC and sizes; the signature is optional"""
+        head = self._reader.read_exact(4)
+        if head == DATA_DESCRIPTOR_SIGNATURE:
+            head = self._reader.read_exact(4)
+        crc = struct.unpack('<I', head)[0]
+        self._reader.read_exact(8)
+        return crc
+
+class _StreamReader:
+    """Buffered forward-only reader with push-back"""
+
+    def __init__(self, stream, chunk_size):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = b''
+
+    def read_some(self, size):
+        if not self._buffer:
+            return self._stream.read(min(size, self._chunk_size))
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def read_exact(self, size):
+        parts = []
+        while size:
+            data = self.read_some(size)
+            if not data:
+                raise ZipStreamError("Archive truncated")
+            parts.append(data)
+            size -= len(data)
+        return b''.join(parts)
+
+    def peek(self, size):
+        while len(self._buffer) < size:
+            data = self._stream.read(self._chunk_size)
+            if not data:
+                break
+            self._buffer += data
+        return self._buffer[:size]
+
+    def unread(self, data):
+        self._buffer = data + self._buffer
+
+def iter_zip_entries(stream, chunk_size=65536):
+    """
+    Iterate over a ZIP archive from its local headers, without seeking
+    Stops at the central directory; memory use is bounded by chunk_size
+    Raises ZipStreamError if the stream is not a ZIP archive
+    """
+    reader = _StreamReader(stream, chunk_size)
+
+    entry = None
+    while reader.peek(4) == LOCAL_HEADER_SIGNATURE:
+        reader.read_exact(4)
+        (_, flags, method, _, _, crc, compressed_size, _,
+         name_length, extra_length) = LOCAL_HEADER.unpack(reader.read_exact(LOCAL_HEADER.size))
+
+        raw_name = reader.read_exact(name_length)
+        name = raw_name.decode('utf-8' if flags & FLAG_UTF8 else 'cp437')
+        reader.read_exact(extra_length)
+
+        if flags & FLAG_ENCRYPTED:
+            raise ZipStreamError(f"Encrypted entry {name} is not supported")
+        if compressed_size == 0xFFFFFFFF:
+            raise ZipStreamError(f"ZIP64 entry {name} is not supported")
+
+        entry = ZipEntry(reader, name, flags, method, crc, compressed_size, chunk_size)
+        yield entry
+        entry.drain()
+
+    tail = reader.peek(4)
+    if tail not in END_SIGNATURES:
+        if entry is None:
+            raise ZipStreamError("Not a ZIP archive")
+        if not tail:
+            raise ZipStreamError(f"Archive truncated after {entry.name}")
+        raise ZipStreamError(f"Unexpected data after {entry.name}")
@@ -0,0 +1,43 @@
+"""Application fixtures backed by a throwaway SQLite database"""
+from app import create_app, db
+from app.models.user import User
+import pytest
+
+API_KEY = 'AIzaSy' + 'x' * 33
+PASSWORD = 'Secret123!'
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """
+    App on a fresh database, with no context pushed
+    Requests reuse an already pushed app context, which would share g and the session between them
+    """
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "invoices.db"}')
+    monkeypatch.delenv('DATABASE_REPLICA_URL', raising=False)
+    application = create_app()
+    application.config.update(TESTING=True)
+    return application
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def make_user(app, username):
+    """Commit a regular user with PASSWORD; returns the id"""
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+def login(client, username, password=PASSWORD, email=None):
+    data = {'email': email or f'{username}@example.com', 'password': password, 'gemini_api_key': API_KEY}
+    response = client.post('/auth/login', data=data)
+    assert response.status_code == 302, response.get_data(as_text=True)
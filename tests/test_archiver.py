@@ -0,0 +1,45 @@
+"""Rebuilding a legacy invoices table in app.utils.archiver.ensure_ids_never_reused"""
+from app import db
+from app.models.invoice import Invoice
+from app.utils.archiver import ensure_ids_never_reused
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateTable
+from tests.conftest import make_user
+import pytest
+
+def _schema(name):
+    return db.session.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                              {'name': name}).scalar()
+
+def _make_legacy_table(user_id):
+    """Recreate invoices as older releases did: no AUTOINCREMENT, and a filename NULL slipped into"""
+    create = str(CreateTable(Invoice.__table__).compile(dialect=db.engine.dialect))
+    create = create.replace(' AUTOINCREMENT', '').replace('filename VARCHAR(255) NOT NULL', 'filename VARCHAR(255)')
+    db.session.execute(text('DROP TABLE invoices'))
+    db.session.execute(text(create))
+    for invoice_id, filename in ((3, 'a.png'), (7, None)):
+        db.session.execute(text("INSERT INTO invoices (id, user_id, filename, file_path) VALUES (:id, :user, :name, 'x')"),
+                           {'id': invoice_id, 'user': user_id, 'name': filename})
+    db.session.commit()
+
+def test_failed_rebuild_leaves_nothing_behind(app, app_context):
+    _make_legacy_table(make_user(app, 'alice'))
+
+    with pytest.raises(IntegrityError):
+        ensure_ids_never_reused()
+    assert _schema('invoices_rebuild') is None
+    assert 'AUTOINCREMENT' not in _schema('invoices')
+    assert db.session.execute(text('SELECT COUNT(*) FROM invoices')).scalar() == 2
+
+    db.session.execute(text("UPDATE invoices SET filename = 'b.png' WHERE filename IS NULL"))
+    db.session.commit()
+    assert ensure_ids_never_reused() is True
+    assert 'AUTOINCREMENT' in _schema('invoices')
+    assert ensure_ids_never_reused() is False
+
+    # Ids continue after the highest one, even once it is deleted
+    db.session.execute(text('DELETE FROM invoices WHERE id = 7'))
+    db.session.execute(text("INSERT INTO invoices (user_id, filename, file_path) VALUES (1, 'c.png', 'x')"))
+    db.session.commit()
+    assert db.session.execute(text('SELECT MAX(id) FROM invoices')).scalar() == 8
@@ -0,0 +1,108 @@
+"""JSON bulk edits through invoice.bulk_edit"""
+from app import db
+from app.models.invoice import Invoice
+from tests.conftest import make_user, login
+from datetime import timedelta
+import pytest
+
+def _invoices(app, user_id, count):
+    """Commit count invoices; returns their ids"""
+    with app.app_context():
+        invoices = [Invoice(user_id=user_id, filename=f'{i}.png', file_path=f'{i}.png', vendor_name=f'Vendor {i}')
+                    for i in range(count)]
+        db.session.add_all(invoices)
+        db.session.commit()
+        return [invoice.id for invoice in invoices]
+
+def _column(app, invoice_id, name='vendor_name'):
+    with app.app_context():
+        return getattr(db.session.get(Invoice, invoice_id), name)
+
+def _bulk_edit(client, patches):
+    response = client.post('/invoice/bulk-edit', json=patches)
+    assert response.is_json, response.get_data(as_text=True)
+    return response.status_code, response.get_json()
+
+@pytest.fixture
+def alice(app, client):
+    user_id = make_user(app, 'alice')
+    login(client, 'alice')
+    return user_id
+
+def test_results_follow_request_order(app, client, alice):
+    first, second, third = _invoices(app, alice, 3)
+    status, body = _bulk_edit(client, [
+        {'id': third, 'fields': {'vendor_name': 'C'}},
+        {'id': 'x', 'fields': {'vendor_name': 'X'}},
+        {'id': first, 'fields': {'vendor_name': 'A', 'category': 'Travel'}},
+        {'id': second, 'fields': {'vendor_name': 'B'}},
+    ])
+    assert status == 200
+    assert body['updated'] == 3
+    assert [(result['id'], result['status']) for result in body['results']] == [
+        (third, 'updated'), ('x', 'invalid'), (first, 'updated'), (second, 'updated')]
+    assert [_column(app, invoice_id) for invoice_id in (first, second, third)] == ['A', 'B', 'C']
+    assert _column(app, first, 'category') == 'Travel'
+
+def test_duplicate_ids_are_rejected(app, client, alice):
+    invoice, other = _invoices(app, alice, 2)
+    status, body = _bulk_edit(client, [
+        {'id': invoice, 'fields': {'vendor_name': 'A'}},
+        {'id': other, 'fields': {'vendor_name': 'B'}},
+        {'id': invoice, 'fields': {'vendor_name': 'C'}},
+    ])
+    assert status == 200
+    assert [result['status'] for result in body['results']] == ['invalid', 'updated', 'invalid']
+    assert body['results'][0]['error'] == 'Duplicate id in request'
+    assert _column(app, invoice) == 'Vendor 0'
+
+def test_stale_updated_at_conflicts(app, client, alice):
+    invoice, other = _invoices(app, alice, 2)
+    stale = (_column(app, invoice, 'updated_at') - timedelta(seconds=5)).isoformat()
+    status, body = _bulk_edit(client, [
+        {'id': invoice, 'fields': {'vendor_name': 'A'}, 'updated_at': stale},
+        {'id': other, 'fields': {'vendor_name': 'B'}, 'updated_at': _column(app, other, 'updated_at').isoformat()},
+    ])
+    assert status == 200
+    assert [result['status'] for result in body['results']] == ['conflict', 'updated']
+    assert _column(app, invoice) == 'Vendor 0'
+
+    # The returned updated_at is the version to send next time
+    status, body = _bulk_edit(client, [
+        {'id': other, 'fields': {'vendor_name': 'B2'}, 'updated_at': body['results'][1]['updated_at']}])
+    assert body['results'][0]['status'] == 'updated'
+    assert _column(app, other) == 'B2'
+
+def test_other_users_invoices_are_not_found(app, client, alice):
+    theirs, = _invoices(app, make_user(app, 'bob'), 1)
+    mine, = _invoices(app, alice, 1)
+    status, body = _bulk_edit(client, [
+        {'id': theirs, 'fields': {'vendor_name': 'A'}},
+        {'id': mine, 'fields': {'vendor_name': 'B'}},
+        {'id': theirs + 1000, 'fields': {'vendor_name': 'C'}},
+    ])
+    assert status == 200
+    assert [result['status'] for result in body['results']] == ['not_found', 'updated', 'not_found']
+    assert _column(app, theirs) == 'Vendor 0'
+
+@pytest.mark.parametrize('invoice_id', [0, -1, 2 ** 63, 2 ** 70, True])
+def test_rejects_out_of_range_ids(app, client, alice, invoice_id):
+    invoice, = _invoices(app, alice, 1)
+    status, body = _bulk_edit(client, [
+        {'id': invoice_id, 'fields': {'vendor_name': 'A'}},
+        {'id': invoice, 'fields': {'vendor_name': 'B'}},
+    ])
+    assert status == 200
+    assert [result['status'] for result in body['results']] == ['invalid', 'updated']
+
+@pytest.mark.parametrize('patch, error', [
+    ({'id': 1, 'fields': {}}, 'fields must be a non-empty object'),
+    ({'id': 1, 'fields': {'user_id': '2'}}, 'Fields not editable: user_id'),
+    ({'id': 1, 'fields': {'vendor_name': 5}}, 'Field values must be strings or null'),
+    ({'id': 1, 'fields': {'vendor_name': 'A'}, 'updated_at': 'yesterday'}, 'updated_at must be an ISO 8601 timestamp'),
+])
+def test_rejects_malformed_patches(client, alice, patch, error):
+    status, body = _bulk_edit(client, [patch])
+    assert status == 200
+    assert body['results'] == [{'id': 1, 'status': 'invalid', 'error': error}]
+    assert body['updated'] == 0
@@ -0,0 +1,90 @@
+"""Concurrency of the SQLite engine configuration from app.utils.db_engine"""
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from app.utils.db_engine import _engine_options
+import threading
+import time
+
+def _make_engine(tmp_path):
+    url = f'sqlite:///{tmp_path / "invoices.db"}'
+    # A fresh connection per use, so each thread opens its own
+    engine = create_engine(url, poolclass=NullPool, **_engine_options(url))
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE invoices (id INTEGER PRIMARY KEY, total TEXT)')
+        conn.exec_driver_sql("INSERT INTO invoices (total) VALUES ('10.00')")
+    return engine
+
+def _connect(engine):
+    """DBAPI connection with the engine's pragmas that leaves transactions to the test"""
+    connection = engine.raw_connection()
+    connection.driver_connection.isolation_level = None
+    return connection
+
+def _run_in_thread(target, timeout=5):
+    """Run target in another thread; returns (finished in time, result or exception)"""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = target()
+        except Exception as e:
+            outcome['result'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    started = time.monotonic()
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), outcome.get('result'), time.monotonic() - started
+
+def test_wal_enabled(tmp_path):
+    engine = _make_engine(tmp_path)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+
+def test_read_while_write_transaction_open(tmp_path):
+    engine = _make_engine(tmp_path)
+    writer = _connect(engine)
+    writer.cursor().execute('BEGIN IMMEDIATE')
+    writer.cursor().execute("INSERT INTO invoices (total) VALUES ('20.00')")
+
+    def read():
+        reader = _connect(engine)
+        try:
+            return reader.cursor().execute('SELECT COUNT(*) FROM invoices').fetchone()[0]
+        finally:
+            reader.close()
+
+    finished, result, elapsed = _run_in_thread(read)
+    writer.cursor().execute('COMMIT')
+    writer.close()
+
+    assert finished, 'reader blocked behind an open write transaction'
+    assert result == 1, result
+    assert elapsed < 1
+
+def test_write_commits_while_read_transaction_open(tmp_path):
+    engine = _make_engine(tmp_path)
+    reader = _connect(engine)
+    reader.cursor().execute('BEGIN')
+    assert reader.cursor().execute('SELECT COUNT(*) FROM invoices').fetchone()[0] == 1
+
+    def write():
+        writer = _connect(engine)
+        try:
+            writer.cursor().execute('BEGIN IMMEDIATE')
+            writer.cursor().execute("INSERT INTO invoices (total) VALUES ('20.00')")
+            writer.cursor().execute('COMMIT')
+        finally:
+            writer.close()
+
+    finished, result, elapsed = _run_in_thread(write)
+
+    # The open read transaction keeps its snapshot until it ends
+    assert reader.cursor().execute('SELECT COUNT(*) FROM invoices').fetchone()[0] == 1
+    reader.cursor().execute('COMMIT')
+    assert reader.cursor().execute('SELECT COUNT(*) FROM invoices').fetchone()[0] == 2
+    reader.close()
+
+    assert finished, 'writer blocked behind an open read transaction'
+    assert not isinstance(result, Exception), result
+    assert elapsed < 1
@@ -0,0 +1,70 @@
+"""Near-duplicate lookup and confirmation in app.models.fingerprint and app.routes.invoice"""
+from app import db
+from app.models.fingerprint import InvoiceFingerprint, CANDIDATE_LIMIT
+from app.models.invoice import Invoice
+from app.routes.invoice import add_fingerprint, find_duplicates
+from app.utils.image_hash import HASH_SIZE
+from tests.conftest import make_user
+import random
+
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+def _invoice(user_id, number='INV-1', total='120.00'):
+    invoice = Invoice(user_id=user_id, filename='scan.png', file_path='scan.png',
+                      invoice_number=number, total_amount=total)
+    db.session.add(invoice)
+    return invoice
+
+def _flip(phash, bits, rng):
+    for bit in rng.sample(range(HASH_BITS), bits):
+        phash ^= 1 << bit
+    return phash
+
+def _store(user_id, phash, **fields):
+    invoice = _invoice(user_id, **fields)
+    add_fingerprint(invoice, phash, [])
+    db.session.commit()
+    return invoice
+
+def test_confirms_duplicate_on_number_and_total(app, app_context):
+    user_id = make_user(app, 'alice')
+    phash = random.Random(1).getrandbits(HASH_BITS)
+    original = _store(user_id, phash)
+
+    rescan = _invoice(user_id, number=' inv-1 ', total='120.00')
+    assert add_fingerprint(rescan, phash, [original.id]) == original.id
+    assert rescan.status == 'Duplicate'
+    assert rescan.fingerprint.duplicate_of_id == original.id
+
+def test_same_template_different_invoice_is_not_duplicate(app, app_context):
+    user_id = make_user(app, 'alice')
+    phash = random.Random(1).getrandbits(HASH_BITS)
+    original = _store(user_id, phash)
+
+    for fields in ({'number': 'INV-2'}, {'total': '99.00'}, {'number': 'N/A'}, {'total': None}):
+        other = _invoice(user_id, **fields)
+        assert add_fingerprint(other, phash, [original.id]) is None
+        assert other.status != 'Duplicate'
+        assert other.fingerprint.duplicate_of_id is None
+
+def test_finds_rescan_among_similar_templates(app, app_context):
+    rng = random.Random(3)
+    user_id, stranger_id = make_user(app, 'alice'), make_user(app, 'bob')
+    template = rng.getrandbits(HASH_BITS)
+    for i in range(CANDIDATE_LIMIT * 2):
+        _store(user_id, _flip(template, 40, rng), number=f'INV-{i}')
+    original = _store(user_id, _flip(template, 40, rng), number='ORIGINAL')
+    theirs = _store(stranger_id, int(original.fingerprint.phash, 16))
+
+    rescan = _flip(int(original.fingerprint.phash, 16), 12, rng)
+    matches = find_duplicates(rescan, user_id)
+    assert matches[0] == original.id
+    assert theirs.id not in matches
+    assert find_duplicates(rescan, stranger_id) == [theirs.id]
+
+def test_blank_page_checks_recent_fingerprints(app, app_context):
+    user_id = make_user(app, 'alice')
+    blank = _store(user_id, 0)
+    assert db.session.get(InvoiceFingerprint, blank.fingerprint.id).buckets == []
+    # No informative bucket to look up, so the most recent fingerprints are compared
+    assert find_duplicates(0, user_id) == [blank.id]
@@ -0,0 +1,45 @@
+"""Perceptual hashing in app.utils.image_hash"""
+from app.utils.image_hash import (_dhash, split_buckets, informative_buckets, hamming_distance,
+                                  HASH_SIZE, BUCKET_BITS, BUCKET_COUNT)
+from PIL import Image
+import random
+
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+def _gradient(darkening):
+    """Horizontal gradient that gets darker (or lighter) to the right"""
+    image = Image.new('L', (340, 320))
+    image.putdata([255 - x * 3 // 4 if darkening else x * 3 // 4 for y in range(320) for x in range(340)])
+    return image
+
+def test_dhash_compares_adjacent_pixels():
+    assert _dhash(_gradient(darkening=True)) == (1 << HASH_BITS) - 1
+    assert _dhash(_gradient(darkening=False)) == 0
+    assert _dhash(Image.new('RGB', (100, 100), 'white')) == 0
+
+def test_dhash_survives_rescaling():
+    image = _gradient(darkening=True)
+    image.paste(0, (100, 100, 200, 200))
+    resized = image.resize((170, 160))
+    assert hamming_distance(_dhash(image), _dhash(resized)) <= 8
+
+def test_split_buckets_round_trip():
+    phash = random.Random(1).getrandbits(HASH_BITS)
+    buckets = split_buckets(phash)
+    assert len(buckets) == BUCKET_COUNT
+    assert all(0 <= value < 1 << BUCKET_BITS for value in buckets)
+    assert sum(value << (BUCKET_BITS * i) for i, value in enumerate(buckets)) == phash
+
+def test_close_hashes_share_a_bucket():
+    rng = random.Random(2)
+    phash = rng.getrandbits(HASH_BITS)
+    for _ in range(50):
+        other = phash
+        for bit in rng.sample(range(HASH_BITS), BUCKET_COUNT - 1):
+            other ^= 1 << bit
+        assert any(a == b for a, b in zip(split_buckets(phash), split_buckets(other)))
+
+def test_informative_buckets_skip_constant_values():
+    phash = (0xFF << BUCKET_BITS) | 0x5A
+    assert informative_buckets(phash) == [(0, 0x5A)]
+    assert informative_buckets(0) == []
@@ -0,0 +1,79 @@
+"""Fair sharing of the Gemini budget in app.utils.scheduler"""
+from app.utils import scheduler
+from app.utils.gemini_extractor import RateLimitExceeded
+from app.utils.scheduler import ExtractionScheduler, INTERACTIVE, BATCH
+import threading
+import time
+import pytest
+
+def _serve_all(extraction_scheduler, tickets):
+    """Queue (user_id, priority) tickets, then grant them in scheduling order"""
+    for user_id, priority in tickets:
+        extraction_scheduler._enqueue(user_id, priority)
+    order = []
+    with extraction_scheduler._condition:
+        while (ticket := extraction_scheduler._next_ticket()) is not None:
+            extraction_scheduler._grant(ticket, time.time())
+            order.append((ticket.user_id, ticket.priority))
+    return order
+
+def _wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.005)
+
+@pytest.mark.parametrize('weight, expected', [
+    (3, 'IIIBIIB'),
+    (1, 'IBIBIII'),
+])
+def test_interactive_weight(weight, expected):
+    extraction_scheduler = ExtractionScheduler(calls_per_minute=100, interactive_weight=weight)
+    order = _serve_all(extraction_scheduler, [(1, BATCH), (1, BATCH)] + [(2, INTERACTIVE)] * 5)
+    assert ''.join('I' if priority == INTERACTIVE else 'B' for _, priority in order) == expected
+
+def test_interactive_runs_freely_without_batch_work():
+    extraction_scheduler = ExtractionScheduler(calls_per_minute=100, interactive_weight=1)
+    order = _serve_all(extraction_scheduler, [(1, INTERACTIVE)] * 4)
+    assert order == [(1, INTERACTIVE)] * 4
+    # Credits are only spent while batch work waits, so a later batch ticket still waits its turn
+    assert extraction_scheduler._credits == 1
+
+def test_users_take_turns_within_a_priority():
+    extraction_scheduler = ExtractionScheduler(calls_per_minute=100)
+    order = _serve_all(extraction_scheduler, [(1, BATCH)] * 3 + [(2, BATCH)] + [(3, BATCH)] * 2)
+    assert [user_id for user_id, _ in order] == [1, 2, 3, 1, 3, 1]
+    assert extraction_scheduler.snapshot() == {}
+
+def test_run_serves_users_in_rotation(monkeypatch):
+    monkeypatch.setattr(scheduler, 'WINDOW_SECONDS', 0.05)
+    extraction_scheduler = ExtractionScheduler(calls_per_minute=1, max_wait=10)
+    served = []
+
+    # Hold the only slot so every run() below queues before any is served
+    extraction_scheduler._granted.append(time.time() + 0.2)
+    threads = []
+    for i, user_id in enumerate([1, 1, 1, 2, 2, 3]):
+        thread = threading.Thread(target=extraction_scheduler.run, args=(user_id, BATCH, served.append, user_id))
+        thread.start()
+        threads.append(thread)
+        _wait_until(lambda: sum(queue[BATCH]['depth'] for queue in extraction_scheduler.snapshot().values()) == i + 1)
+    for thread in threads:
+        thread.join(5)
+
+    assert served == [1, 2, 3, 1, 2, 1]
+
+def test_max_wait_raises_rate_limit(monkeypatch):
+    monkeypatch.setattr(scheduler, 'WINDOW_SECONDS', 0.5)
+    extraction_scheduler = ExtractionScheduler(calls_per_minute=1, max_wait=0.1)
+    assert extraction_scheduler.run(1, INTERACTIVE, lambda: 'first') == 'first'
+
+    started = time.time()
+    with pytest.raises(RateLimitExceeded):
+        extraction_scheduler.run(2, INTERACTIVE, lambda: 'second')
+    assert 0.1 <= time.time() - started < 0.5
+    assert extraction_scheduler.snapshot() == {}
+
+    # The window frees the slot, so a caller willing to wait for it gets through
+    extraction_scheduler.configure(interactive_weight=3, max_wait=2)
+    assert extraction_scheduler.run(2, INTERACTIVE, lambda: 'third') == 'third'
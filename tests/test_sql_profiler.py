@@ -0,0 +1,68 @@
+"""Query counts of list views, guarded with app.utils.sql_profiler.assert_max_queries"""
+from app import db, ADMIN_EMAIL, ADMIN_PASSWORD
+from app.models.fingerprint import InvoiceFingerprint
+from app.models.invoice import Invoice
+from app.models.user import User
+from app.utils.sql_profiler import assert_max_queries, count_queries
+from tests.conftest import make_user, login
+import pytest
+
+USERNAMES = ['alice', 'bob', 'carol']
+
+def _seed(app, per_user=6):
+    """Invoices with items and fingerprints for every user in USERNAMES"""
+    with app.app_context():
+        for user in User.query.filter(User.username.in_(USERNAMES)):
+            for i in range(per_user):
+                invoice = Invoice(user_id=user.id, filename=f'{i}.png', file_path=f'{i}.png',
+                                  invoice_number=f'{user.username}-{i}', vendor_name=f'Vendor {i}',
+                                  customer_name=user.username, total_amount=f'{i}.00', category='Office')
+                invoice.set_items([{'description': 'Paper', 'quantity': '1', 'unit_price': f'{i}.00', 'total': f'{i}.00'}])
+                db.session.add(invoice)
+                db.session.add(InvoiceFingerprint.create(invoice, i + 1 << 8))
+        db.session.commit()
+
+@pytest.fixture
+def seeded(app):
+    for username in USERNAMES:
+        make_user(app, username)
+    _seed(app)
+
+def _login(client, as_admin):
+    if as_admin:
+        login(client, 'SecureAdmin', password=ADMIN_PASSWORD, email=ADMIN_EMAIL)
+    else:
+        login(client, 'alice')
+
+@pytest.mark.parametrize('as_admin', [False, True])
+def test_dashboard_queries(app, client, seeded, as_admin):
+    _login(client, as_admin)
+    with assert_max_queries(app, 3):
+        response = client.get('/dashboard')
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'alice-5' in page
+    assert ('bob-5' in page) == as_admin
+
+@pytest.mark.parametrize('as_admin', [False, True])
+def test_export_all_queries(app, client, seeded, as_admin):
+    _login(client, as_admin)
+    with assert_max_queries(app, 2):
+        response = client.get('/invoice/export-all')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def test_query_count_does_not_grow_with_invoices(app, client, seeded):
+    _login(client, as_admin=True)
+    with count_queries(app) as before:
+        client.get('/invoice/export-all')
+    _seed(app)
+    with count_queries(app) as after:
+        client.get('/invoice/export-all')
+    assert after.count == before.count
+
+def test_assert_max_queries_lists_statements(app):
+    with app.app_context(), pytest.raises(AssertionError, match=r'at most 1 queries, got 2:\nSELECT'):
+        with assert_max_queries(app, 1):
+            User.query.all()
+            Invoice.query.all()
@@ -0,0 +1,67 @@
+"""PDF text compaction in app.utils.text_compactor"""
+from app.utils.text_compactor import compact_pdf_text, TERMS_MAX_LINES
+
+def _lines(text):
+    return text.splitlines()
+
+def test_collapses_whitespace_and_drops_page_counters():
+    text = compact_pdf_text(['INVOICE   #123\n\n\nTotal\t20.00\nPage 1 of 1'])
+    assert _lines(text) == ['INVOICE #123', 'Total 20.00']
+
+def test_terms_heading_at_top_keeps_parties():
+    page = '\n'.join([
+        'Terms & Conditions',
+        'Goods remain our property until paid in full.',
+        'Disputes must be raised within fourteen days of delivery.',
+        'ACME Supplies Ltd',
+        'Bill To: Globex Corporation',
+        'INVOICE #123',
+        'Widget 2 x 10.00 20.00',
+        'Total 20.00',
+    ])
+    lines = _lines(compact_pdf_text([page]))
+    assert lines == ['ACME Supplies Ltd', 'Bill To: Globex Corporation', 'INVOICE #123',
+                     'Widget 2 x 10.00 20.00', 'Total 20.00']
+
+def test_terms_heading_mid_page_is_detected():
+    page = '\n'.join([
+        'ACME Supplies Ltd',
+        'Total 20.00',
+        'Terms and Conditions:',
+        'Payment is due within thirty days of the invoice date.',
+        'Late payments incur interest at the statutory rate.',
+        'Bank: First National 12-34-56',
+    ])
+    lines = _lines(compact_pdf_text([page]))
+    assert lines == ['ACME Supplies Ltd', 'Total 20.00', 'Bank: First National 12-34-56']
+
+def test_heading_inside_a_sentence_is_not_a_section():
+    page = 'Terms & Conditions apply, see reverse\nINVOICE #123\nTotal 20.00'
+    assert _lines(compact_pdf_text([page])) == _lines(page)
+
+def test_terms_section_is_bounded():
+    clauses = [f'Clause {i} says something long about delivery and returns.' for i in range(TERMS_MAX_LINES + 5)]
+    lines = _lines(compact_pdf_text(['Terms & Conditions\n' + '\n'.join(clauses)]))
+    assert lines == clauses[TERMS_MAX_LINES:]
+
+def test_repeated_line_items_are_kept():
+    pages = [
+        'ACME Supplies Ltd\nStatement March\nItem A 10.00\nItem B 5.00\nCarried forward 15.00',
+        'ACME Supplies Ltd\nStatement March\nBrought forward 15.00\nItem A 10.00\nItem C 7.50\nItem D 1.00\n'
+        'Item E 2.00\nTotal 35.50',
+    ]
+    lines = _lines(compact_pdf_text(pages))
+    assert lines.count('Item A 10.00') == 2
+    assert lines.count('ACME Supplies Ltd') == 1
+    assert lines.count('Statement March') == 1
+
+def test_repeated_footer_with_amount_is_deduplicated():
+    footer = 'Balance due 120.00'
+    pages = [f'Item {i} {i}.00\nItem {i}b 1.00\nItem {i}c 2.00\nItem {i}d 3.00\n{footer}' for i in range(1, 4)]
+    lines = _lines(compact_pdf_text(pages))
+    assert lines.count(footer) == 1
+    assert 'Item 2 2.00' in lines
+
+def test_token_budget_keeps_number_dense_pages():
+    pages = ['Notes ' * 100, 'Item 1.00 2.00 3.00\nTotal 6.00']
+    assert compact_pdf_text(pages, token_budget=20) == 'Item 1.00 2.00 3.00\nTotal 6.00'
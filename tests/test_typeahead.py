@@ -0,0 +1,114 @@
+"""Name suggestions in app.utils.typeahead"""
+from app.utils.typeahead import PrefixIndex, TypeaheadCache, ALL_INVOICES
+import threading
+
+def _index(names):
+    index = PrefixIndex()
+    for field, value, count in names:
+        index.add(field, value, count)
+    return index
+
+def _values(matches):
+    return [match['value'] for match in matches]
+
+NAMES = [
+    ('vendor_name', 'Acme Ltd', 5),
+    ('vendor_name', 'acme supplies', 9),
+    ('customer_name', 'Acme Ltd', 2),
+    ('vendor_name', 'Apex', 1),
+    ('vendor_name', 'Beta Corp', 20),
+    ('customer_name', 'N/A', 50),
+    ('customer_name', '', 50),
+]
+
+def test_search_ranks_prefix_matches_by_count():
+    index = _index(NAMES)
+    assert len(index) == 5
+    assert index.search('ACME') == [
+        {'value': 'acme supplies', 'field': 'vendor_name', 'count': 9},
+        {'value': 'Acme Ltd', 'field': 'vendor_name', 'count': 5},
+        {'value': 'Acme Ltd', 'field': 'customer_name', 'count': 2},
+    ]
+    assert _values(index.search('a', limit=2)) == ['acme supplies', 'Acme Ltd']
+    assert _values(index.search('acme', field='customer_name')) == ['Acme Ltd']
+    assert index.search('n/') == []
+    assert index.search('zed') == []
+
+def test_add_and_remove_adjust_counts():
+    index = _index(NAMES)
+    index.add('vendor_name', 'ACME LTD')
+    assert index.search('acme ltd', field='vendor_name')[0]['count'] == 6
+
+    index.remove('vendor_name', 'Apex')
+    assert index.search('ap') == []
+    index.remove('vendor_name', 'Apex')
+    index.remove('vendor_name', None)
+    assert len(index) == 4
+
+    index.remove('vendor_name', 'Beta Corp')
+    assert index.search('beta')[0]['count'] == 19
+
+def _loader(names, calls):
+    def load():
+        calls.append(names)
+        return [('vendor_name', name, 1) for name in names]
+    return load
+
+def test_cache_evicts_least_recently_used():
+    cache, calls = TypeaheadCache(max_entries=5), []
+    cache.get(1, _loader(['a1', 'a2'], calls))
+    cache.get(2, _loader(['b1', 'b2'], calls))
+    cache.get(1, _loader(['unused'], calls))
+    cache.get(3, _loader(['c1', 'c2'], calls))
+
+    # Scope 2 was least recently used once scope 3 pushed the total past max_entries
+    assert list(cache._indexes) == [1, 3]
+    assert _values(cache.search(2, _loader(['b3'], calls), 'b')) == ['b3']
+    assert calls == [['a1', 'a2'], ['b1', 'b2'], ['c1', 'c2'], ['b3']]
+
+def test_cache_keeps_one_index_over_budget():
+    cache = TypeaheadCache(max_entries=1)
+    cache.get(1, _loader(['a1', 'a2', 'a3'], []))
+    assert list(cache._indexes) == [1]
+
+def test_cache_rebuilds_after_ttl():
+    cache, calls = TypeaheadCache(ttl=0), []
+    cache.get(1, _loader(['a'], calls))
+    cache.get(1, _loader(['b'], calls))
+    assert calls == [['a'], ['b']]
+
+def test_apply_updates_user_and_all_invoices_indexes():
+    cache = TypeaheadCache()
+    cache.get(1, _loader(['Old Name'], []))
+    cache.get(ALL_INVOICES, _loader(['Old Name'], []))
+    cache.apply([(1, 'vendor_name', 'Old Name', 'New Name'), (2, 'vendor_name', None, 'Other')])
+
+    assert _values(cache.search(1, None, 'n')) == ['New Name']
+    assert cache.search(1, None, 'old') == []
+    assert _values(cache.search(ALL_INVOICES, None, '')) == ['New Name', 'Other']
+    assert 2 not in cache._indexes
+
+def test_search_while_changes_apply():
+    cache = TypeaheadCache()
+    cache.get(1, _loader([f'name {i:04d}' for i in range(2000)], []))
+    stop, errors = threading.Event(), []
+
+    def churn():
+        i = 0
+        while not stop.is_set():
+            cache.apply([(1, 'vendor_name', f'name {i % 2000:04d}', f'renamed {i}')])
+            cache.apply([(1, 'vendor_name', f'renamed {i}', f'name {i % 2000:04d}')])
+            i += 1
+
+    thread = threading.Thread(target=churn)
+    thread.start()
+    try:
+        for _ in range(1000):
+            try:
+                cache.search(1, None, 'name 1', limit=2000)
+            except Exception as e:
+                errors.append(e)
+    finally:
+        stop.set()
+        thread.join()
+    assert errors == []
@@ -0,0 +1,122 @@
+"""Forward-only ZIP parsing in app.utils.zip_stream"""
+from app.utils.zip_stream import iter_zip_entries, ZipStreamError
+import hashlib
+import io
+import os
+import pytest
+import zipfile
+
+class _Unseekable(io.RawIOBase):
+    """Write target zipfile cannot seek in, so it emits data descriptors"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+class _ShortReads(io.RawIOBase):
+    """Request-body-like stream that returns a few bytes per read"""
+
+    def __init__(self, data, size=7):
+        self._data = io.BytesIO(data)
+        self._size = size
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._data.read(min(self._size, size) if size and size > 0 else self._size)
+
+def _archive(entries, compression=zipfile.ZIP_DEFLATED, seekable=True):
+    target = io.BytesIO() if seekable else _Unseekable()
+    with zipfile.ZipFile(target, 'w', compression=compression) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+    return (target if seekable else target.buffer).getvalue()
+
+def _read_all(data, **kwargs):
+    return [(entry.name, b''.join(entry.iter_chunks())) for entry in iter_zip_entries(io.BytesIO(data), **kwargs)]
+
+ENTRIES = [('a.pdf', b'%PDF-1.4 invoice one' * 50), ('scans/b.png', os.urandom(3000)), ('empty.jpg', b'')]
+
+@pytest.mark.parametrize('compression', [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_reads_entries(compression):
+    assert _read_all(_archive(ENTRIES, compression)) == ENTRIES
+
+def test_reads_deflated_entries_with_data_descriptor():
+    data = _archive(ENTRIES, seekable=False)
+    assert zipfile.ZipFile(io.BytesIO(data)).infolist()[0].flag_bits & 0x8
+    assert _read_all(data) == ENTRIES
+
+def test_rejects_stored_entry_with_data_descriptor():
+    data = _archive(ENTRIES, zipfile.ZIP_STORED, seekable=False)
+    with pytest.raises(ZipStreamError, match='no size'):
+        _read_all(data)
+
+def test_short_reads():
+    data = _archive(ENTRIES)
+    entries = [(entry.name, b''.join(entry.iter_chunks()))
+               for entry in iter_zip_entries(_ShortReads(data), chunk_size=64)]
+    assert entries == ENTRIES
+
+def test_skips_partially_read_entry():
+    data = _archive(ENTRIES)
+    names = []
+    for entry in iter_zip_entries(io.BytesIO(data), chunk_size=16):
+        names.append(entry.name)
+        if entry.name == 'a.pdf':
+            assert len(next(entry.iter_chunks())) <= 16
+        elif entry.name == 'scans/b.png':
+            assert b''.join(entry.iter_chunks()) == ENTRIES[1][1]
+    assert names == [name for name, _ in ENTRIES]
+
+def test_large_archive_in_bounded_chunks():
+    payload = b''.join(hashlib.sha256(str(i).encode()).digest() for i in range(600000))
+    assert len(payload) > 16 * 1024 * 1024
+    data = _archive([('big.pdf', payload)])
+
+    digest, largest = hashlib.sha256(), 0
+    for entry in iter_zip_entries(io.BytesIO(data), chunk_size=65536):
+        for chunk in entry.iter_chunks():
+            digest.update(chunk)
+            largest = max(largest, len(chunk))
+    assert digest.digest() == hashlib.sha256(payload).digest()
+    assert largest <= 65536
+
+def test_empty_archive():
+    assert _read_all(_archive([])) == []
+
+@pytest.mark.parametrize('data', [b'', b'not a zip file', b'%PDF-1.4\n' + b'x' * 100])
+def test_rejects_non_zip(data):
+    with pytest.raises(ZipStreamError, match='Not a ZIP archive'):
+        _read_all(data)
+
+@pytest.mark.parametrize('compression', [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+def test_rejects_truncated_archive(compression):
+    data = _archive(ENTRIES, compression)
+    with pytest.raises(ZipStreamError, match='truncated'):
+        _read_all(data[:len(data) // 2])
+
+def test_rejects_archive_cut_before_central_directory():
+    data = _archive(ENTRIES[:1], zipfile.ZIP_STORED)
+    end = data.index(b'PK\x01\x02')
+    with pytest.raises(ZipStreamError, match='truncated after a.pdf'):
+        _read_all(data[:end])
+
+def test_rejects_encrypted_entry():
+    data = bytearray(_archive(ENTRIES))
+    # General purpose flags sit right after the signature and version in the local header
+    data[6] |= 0x1
+    with pytest.raises(ZipStreamError, match='Encrypted'):
+        _read_all(bytes(data))
+
+def test_rejects_crc_mismatch():
+    data = bytearray(_archive(ENTRIES[:1], zipfile.ZIP_STORED))
+    header_end = 30 + len('a.pdf')
+    data[header_end] ^= 0xFF
+    with pytest.raises(ZipStreamError, match='CRC mismatch'):
+        _read_all(bytes(data))